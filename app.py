@@ -1,43 +1,148 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, stream_with_context
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from bson import ObjectId
 from datetime import datetime, timedelta
 from flask_bcrypt import Bcrypt
-from flask_session import Session
 from functools import wraps
 import os
+import json
 import logging
+import threading
+import time
 
-from modules import content_processor, mcq_generator, utils, rag_chatbot, config
+from modules import content_processor, mcq_generator, utils, evaluator, analytics, metrics, config
+from modules.job_queue import JobQueue, JobQueueFull
+from modules.ollama_client import OllamaError
+from modules.knowledge_base import KnowledgeBaseError
+from modules.embedding_service import get_embedding_service, embedding_service_status
+from modules.mongo_session import CachedMongoSessionInterface
+from modules.bulk_writer import BulkWriter
 
 # ---------------- FLASK SETUP ----------------
 app = Flask(__name__)
 bcrypt = Bcrypt(app)
 
-app.config['UPLOAD_FOLDER'] = getattr(config, 'UPLOAD_DIRECTORY', 'uploads')
 app.secret_key = os.getenv(
     "SECRET_KEY",
     "97d9db56259ef94e22c48dc1789c8988dd01f69c6743afbf67882971ff2e6bf8"
 )
-app.config["SESSION_TYPE"] = "filesystem"
 app.config["SESSION_PERMANENT"] = True
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=7)
 
-Session(app)
+metrics.init_app(app, slow_request_seconds=config.SLOW_REQUEST_SECONDS)
 
-# Initialize Chatbot
-bot = rag_chatbot.RAGChatbot()
+# ---------------- LAZY MODELS ----------------
+# The chatbot (FAISS, LangChain) and the embedding model are loaded on first
+# use so the web server starts serving immediately. An optional background
+# warm-up loads them right after start; /ready returns 200 only once both are
+# loaded and the database is set up (in lazy mode, after first use).
+_bot = None
+_bot_lock = threading.Lock()
+_warmed_up = threading.Event()
+
+
+def get_bot():
+    global _bot
+    with _bot_lock:
+        if _bot is None:
+            from modules import rag_chatbot
+            _bot = rag_chatbot.RAGChatbot()
+        return _bot
+
+
+def _warm_up():
+    try:
+        get_embedding_service()
+        get_bot()
+        logging.info("Warm-up complete.")
+    except Exception:
+        logging.exception("Warm-up failed")
+    finally:
+        _warmed_up.set()
+
+
+# With `python app.py`, PDF extraction workers re-import this script as
+# __mp_main__; they must not start the app's background work themselves.
+_POOL_WORKER = __name__ == "__mp_main__"
+
+if config.EXTRACT_PROCESS_WORKERS > 1 and not _POOL_WORKER:
+    utils.get_process_pool()
+
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1" if config.WARMUP_ON_START else "0") == "1"
+if WARMUP_ON_START and not _POOL_WORKER:
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+else:
+    _warmed_up.set()
 
 # ---------------- DATABASE ----------------
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "EduMentorDB")
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+# Pool workers (see _POOL_WORKER) only need modules.utils from this script:
+# no Mongo client, write-buffer thread, session store or job queue of their own.
+if not _POOL_WORKER:
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS)
+    db = client[DB_NAME]
+
+    users_collection        = db["users"]
+    summaries_collection    = db["summaries"]
+    quiz_results_collection = db["quiz_results"]
+    session_logs_collection = db["session_logs"]
+    jobs_collection         = db["jobs"]
+
+    # Audit records and analytics rollups are written behind the request
+    writer = BulkWriter(
+        db,
+        max_batch=config.BULK_WRITE_MAX_BATCH,
+        flush_seconds=config.BULK_WRITE_FLUSH_SECONDS,
+        max_queue=config.BULK_WRITE_MAX_QUEUE,
+        enqueue_timeout=config.BULK_WRITE_ENQUEUE_TIMEOUT,
+        max_retries=config.BULK_WRITE_MAX_RETRIES,
+        retry_backoff=config.BULK_WRITE_RETRY_BACKOFF
+    )
+
+    # Server-side sessions live in Mongo (TTL-expired), shared by every app host
+    app.session_interface = CachedMongoSessionInterface(
+        app,
+        client=client,
+        db=DB_NAME,
+        collection=config.SESSION_COLLECTION,
+        cache_seconds=config.SESSION_CACHE_SECONDS,
+        cache_max_entries=config.SESSION_CACHE_MAX_ENTRIES,
+        refresh_seconds=config.SESSION_REFRESH_SECONDS
+    )
 
-users_collection        = db["users"]
-summaries_collection    = db["summaries"]
-quiz_results_collection = db["quiz_results"]
-session_logs_collection = db["session_logs"]
+# Index creation (including the session TTL index) needs Mongo round trips,
+# so it runs in the background, retrying until Mongo is reachable, instead of
+# blocking start-up. Rollups for students that predate them are backfilled
+# in the same thread afterwards.
+_database_ready = threading.Event()
+
+
+def _prepare_database():
+    while not (analytics.ensure_indexes(db) and app.session_interface.ensure_ttl_index()):
+        time.sleep(config.DB_SETUP_RETRY_SECONDS)
+    _database_ready.set()
+    logging.info("Database indexes ready.")
+    try:
+        backfilled = analytics.backfill_missing_rollups(db, writer)
+        if backfilled:
+            logging.info(f"Backfilled analytics rollups for {backfilled} students.")
+    except PyMongoError:
+        logging.exception("Analytics rollup backfill failed")
+
+
+if not _POOL_WORKER:
+    threading.Thread(target=_prepare_database, name="db-setup", daemon=True).start()
+
+    # Background jobs for slow LLM work (summaries, quizzes)
+    jobs = JobQueue(
+        max_workers=config.JOB_MAX_CONCURRENCY,
+        max_pending=config.JOB_MAX_PENDING,
+        store=jobs_collection,
+        retention_seconds=config.JOB_RETENTION_SECONDS
+    )
 
 
 # ---------------- MIDDLEWARE ----------------
@@ -83,16 +188,24 @@ def register():
         return jsonify({"error": "Username and password required"}), 400
     if password != confirm:
         return jsonify({"error": "Passwords do not match"}), 400
-    if users_collection.count_documents({"username": username}):
+    with metrics.stage("mongo.users_lookup"):
+        exists = users_collection.count_documents({"username": username})
+    if exists:
         return jsonify({"error": "User already exists"}), 400
 
     hashed_pass = bcrypt.generate_password_hash(password).decode("utf-8")
-    users_collection.insert_one({
-        "username": username,
-        "password": hashed_pass,
-        "role": "user",
-        "created_at": datetime.utcnow()
-    })
+    try:
+        with metrics.stage("mongo.users_insert"):
+            users_collection.insert_one({
+                "username": username,
+                "password": hashed_pass,
+                "role": "user",
+                "created_at": datetime.utcnow()
+            })
+    except DuplicateKeyError:
+        return jsonify({"error": "User already exists"}), 400
+    with metrics.stage("mongo.rollup_init"):
+        analytics.init_student_rollup(db, username)
 
     return jsonify({"message": "Student registered successfully!"})
 
@@ -103,21 +216,24 @@ def login():
     username = data.get("username", "").strip()
     password = data.get("password", "")
 
-    user = users_collection.find_one({"username": username})
+    with metrics.stage("mongo.users_lookup"):
+        user = users_collection.find_one({"username": username})
     if not user or not bcrypt.check_password_hash(user["password"], password):
         return jsonify({"error": "Invalid credentials"}), 401
 
+    login_time = datetime.utcnow()
     session["username"]   = user["username"]
     session["role"]       = user["role"]
-    session["login_time"] = datetime.utcnow()
+    session["login_time"] = login_time.isoformat()  # session values are msgpack-serialized
 
-    session_logs_collection.insert_one({
+    log_id = writer.insert_one("session_logs", {
         "username": user["username"],
         "role": user["role"],
-        "login_time": session["login_time"],
+        "login_time": login_time,
         "logout_time": None,
         "duration_minutes": None
     })
+    session["log_id"] = str(log_id)  # session_logs entry, closed on logout
 
     if user["role"] == "admin":
         return redirect(url_for("admin_dashboard"))
@@ -126,15 +242,19 @@ def login():
 
 @app.route('/logout')
 def logout():
-    if session.get("username") and session.get("login_time"):
+    if session.get("log_id") and session.get("login_time"):
         logout_time = datetime.utcnow()
-        duration = (logout_time - session["login_time"]).total_seconds() / 60
+        duration = (logout_time - datetime.fromisoformat(session["login_time"])).total_seconds() / 60
 
-        session_logs_collection.update_one(
-            {"username": session["username"], "logout_time": None},
+        writer.update_one(
+            "session_logs",
+            {"_id": ObjectId(session["log_id"])},
             {"$set": {"logout_time": logout_time, "duration_minutes": round(duration, 2)}}
         )
 
+    if session.get("username") and _bot is not None:
+        _bot.clear_session(session["username"])
+
     session.clear()
     return redirect(url_for("home"))
 
@@ -180,17 +300,93 @@ def ask_ai():
 
     if file:
         logging.info(f"File uploaded in chat: {file.filename}")
-        text = utils.extract_text_from_file(file, app.config['UPLOAD_FOLDER'])
+        text = utils.extract_text_from_file(file)
         
         if text and not text.startswith("Error"):
-            bot.setup_document(text)
+            get_bot().setup_document(text, session_key=session["username"])
         elif text.startswith("Error"):
              return jsonify({"answer": f"⚠️ Failed to read file: {text}"}), 400
 
-    answer = bot.answer_query(question)
+    # scope=kb answers from the student's knowledge base, optionally only the listed documents.
+    use_knowledge_base = request.form.get("scope") == "kb"
+    doc_ids = [d for d in request.form.get("doc_ids", "").split(",") if d.strip()] or None
+    options = {"use_knowledge_base": use_knowledge_base, "doc_ids": doc_ids}
+
+    if request.form.get("stream") == "1":
+        return _stream_answer(question, session["username"], options)
+
+    answer = get_bot().answer_query(question, session_key=session["username"], **options)
     return jsonify({"answer": answer})
 
 
+def _stream_answer(question, session_key, options):
+    """Stream the answer as NDJSON: one {"token": ...} line per chunk, then {"done": true}."""
+    def generate():
+        for token in get_bot().stream_query(question, session_key=session_key, **options):
+            yield json.dumps({"token": token}) + "\n"
+        yield json.dumps({"done": True}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ---------------- KNOWLEDGE BASE ----------------
+KB_UNREADABLE = "Your knowledge base could not be read. Nothing was changed; please contact an administrator."
+
+
+@app.route('/kb/documents', methods=['GET'])
+@login_required
+def list_kb_documents():
+    try:
+        documents = get_bot().list_knowledge_base(session["username"])
+    except KnowledgeBaseError:
+        logging.exception("Knowledge base load failed")
+        return jsonify({"error": KB_UNREADABLE}), 500
+    return jsonify({"documents": documents})
+
+
+@app.route('/kb/documents', methods=['POST'])
+@login_required
+def add_kb_document():
+    text = request.form.get("text", "").strip()
+    file = request.files.get("file")
+    filename = request.form.get("title", "").strip() or "text_input"
+
+    if not text and file:
+        text = utils.extract_text_from_file(file)
+        filename = file.filename
+        if text and text.startswith("Error"):
+            return jsonify({"error": f"Failed to read file: {text}"}), 400
+
+    if not text:
+        return jsonify({"error": "No input provided"}), 400
+
+    try:
+        document = get_bot().add_to_knowledge_base(session["username"], text, filename)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except KnowledgeBaseError:
+        logging.exception("Knowledge base load failed")
+        return jsonify({"error": KB_UNREADABLE}), 500
+    return jsonify(document), 201 if document["added"] else 200
+
+
+@app.route('/kb/documents/<doc_id>', methods=['DELETE'])
+@login_required
+def remove_kb_document(doc_id):
+    try:
+        removed = get_bot().remove_from_knowledge_base(session["username"], doc_id)
+    except KnowledgeBaseError:
+        logging.exception("Knowledge base load failed")
+        return jsonify({"error": KB_UNREADABLE}), 500
+    if not removed:
+        return jsonify({"error": "Document not found"}), 404
+    return jsonify({"message": "Document removed"})
+
+
 # ---------------- SUMMARY SAVE ----------------
 @app.route('/summarize', methods=['POST'])
 @login_required
@@ -199,24 +395,31 @@ def summarize():
     file = request.files.get("file")
 
     if not text and file:
-        text = utils.extract_text_from_file(file, app.config['UPLOAD_FOLDER'])
+        text = utils.extract_text_from_file(file)
 
     if not text:
         return jsonify({"error": "No input provided"}), 400
 
     summary = content_processor.generate_bullet_point_summary(text)
 
-    summaries_collection.insert_one({
-        "student": session["username"],
-        "source_filename": file.filename if file else "text_input",
-        "timestamp": datetime.utcnow(),
-        "action": "summary",
-        "summary_type": "bullet_point"   # NEW 🔹
-    })
+    _log_activity("summary", file.filename if file else "text_input", "bullet_point")
 
     return jsonify({"summary": summary})
 
 
+def _log_activity(action, source_filename, summary_type):
+    """Record a summary/quiz request and bump the student's analytics rollup."""
+    with writer.group():
+        writer.insert_one("summaries", {
+            "student": session["username"],
+            "source_filename": source_filename,
+            "timestamp": datetime.utcnow(),
+            "action": action,
+            "summary_type": summary_type
+        })
+        analytics.record_summary(writer, session["username"], summary_type)
+
+
 # ---------------- MCQ GENERATOR ----------------
 @app.route('/generate_quiz', methods=['POST'])
 @login_required
@@ -225,24 +428,120 @@ def generate_quiz():
     file = request.files.get("file")
 
     if file:
-        text = utils.extract_text_from_file(file, app.config['UPLOAD_FOLDER'])
+        text = utils.extract_text_from_file(file)
 
     if not text:
         return jsonify({"error": "No text provided"}), 400
 
     mcqs = mcq_generator.generate_meaningful_mcqs(text, num_questions=5)
 
-    summaries_collection.insert_one({
-        "student": session["username"],
-        "source_filename": file.filename if file else "text_input",
-        "timestamp": datetime.utcnow(),
-        "action": "quiz",
-        "summary_type": "mcq"     # NEW 🔹
-    })
+    _log_activity("quiz", file.filename if file else "text_input", "mcq")
 
     return jsonify({"mcqs": mcqs})
 
 
+@app.route('/generate_quiz/stream', methods=['POST'])
+@login_required
+def stream_quiz():
+    """Stream the quiz as NDJSON: one {"mcq": ...} line per question as it completes, then {"done": true}."""
+    text = request.form.get("text", "")
+    file = request.files.get("file")
+
+    if file:
+        text = utils.extract_text_from_file(file)
+
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+
+    _log_activity("quiz", file.filename if file else "text_input", "mcq")
+
+    def generate():
+        count = 0
+        try:
+            for mcq in mcq_generator.stream_mcqs(text, num_questions=5):
+                yield json.dumps({"mcq": mcq}) + "\n"
+                count += 1
+        except OllamaError:
+            yield json.dumps({"error": "Could not connect to Ollama."}) + "\n"
+            return
+        if not count:
+            yield json.dumps({"error": "The AI generated text but we couldn't find any questions."}) + "\n"
+            return
+        yield json.dumps({"done": True, "count": count}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ---------------- BACKGROUND JOBS ----------------
+@app.route('/jobs/summarize', methods=['POST'])
+@login_required
+def submit_summary_job():
+    text = request.form.get("text", "").strip()
+    file = request.files.get("file")
+
+    if not text and file:
+        text = utils.extract_text_from_file(file)
+
+    if not text:
+        return jsonify({"error": "No input provided"}), 400
+
+    return _submit_job(
+        "summary", content_processor.generate_bullet_point_summary, text,
+        source_filename=file.filename if file else "text_input",
+        summary_type="bullet_point"
+    )
+
+
+@app.route('/jobs/generate_quiz', methods=['POST'])
+@login_required
+def submit_quiz_job():
+    text = request.form.get("text", "")
+    file = request.files.get("file")
+
+    if file:
+        text = utils.extract_text_from_file(file)
+
+    if not text:
+        return jsonify({"error": "No text provided"}), 400
+
+    return _submit_job(
+        "quiz", mcq_generator.generate_meaningful_mcqs, text, num_questions=5,
+        source_filename=file.filename if file else "text_input",
+        summary_type="mcq"
+    )
+
+
+def _submit_job(action, func, *args, source_filename, summary_type, **kwargs):
+    try:
+        job_id = jobs.submit(action, session["username"], func, *args, **kwargs)
+    except JobQueueFull:
+        return jsonify({"error": "Server is busy, please try again shortly."}), 503
+
+    _log_activity(action, source_filename, summary_type)
+
+    return jsonify({"job_id": job_id, "status_url": url_for("job_status", job_id=job_id)}), 202
+
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if not job or job["owner"] != session["username"]:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify({
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"]
+    })
+
+
 # ---------------- MCQ SUBMIT ----------------
 @app.route('/submit_mcqs', methods=['POST'])
 @login_required
@@ -261,10 +560,33 @@ def submit_mcqs():
         "timestamp": datetime.utcnow()
     }
 
-    quiz_results_collection.insert_one(record)
+    with writer.group():
+        writer.insert_one("quiz_results", record)
+        analytics.record_quiz_result(writer, record)
     return jsonify({"message": "Result saved successfully!", "data": record})
 
 
+# ---------------- BATCH GRADING ----------------
+@app.route('/grade_answers', methods=['POST'])
+@login_required
+def grade_answers():
+    data = request.json or {}
+    reference = data.get("reference", "")
+    answers = data.get("answers", [])
+
+    if not isinstance(reference, str) or not reference.strip():
+        return jsonify({"error": "Reference answer required"}), 400
+    if not isinstance(answers, list) or not all(isinstance(a, str) for a in answers):
+        return jsonify({"error": "answers must be a list of strings"}), 400
+    if len(answers) > config.GRADING_MAX_ANSWERS:
+        return jsonify({"error": f"At most {config.GRADING_MAX_ANSWERS} answers per request"}), 400
+
+    graded = evaluator.evaluate_student_answers(answers, reference)
+    return jsonify({
+        "results": [{"score": score, "feedback": feedback} for score, feedback in graded]
+    })
+
+
 # ---------------- STUDENT ANALYTICS (PROFILE) ----------------
 @app.route('/analytics_summary/<student>')
 @login_required
@@ -275,63 +597,146 @@ def analytics_summary(student):
     if role != "admin" and viewer != student:
         return jsonify({"error": "Not allowed"}), 403
 
-    quiz_trend = list(
-        quiz_results_collection.find(
-            {"student": student},
-            {"_id": 0, "percentage": 1, "timestamp": 1}
-        )
-    )
-
-    score_by_file = list(quiz_results_collection.aggregate([
-        {"$match": {"student": student}},
-        {"$group": {"_id": "$filename", "avg": {"$avg": "$percentage"}}}
-    ]))
-
+    with metrics.stage("mongo.analytics_summary"):
+        summary = analytics.student_summary(db, student)
+    return jsonify(summary)
 
-    summary_types = list(summaries_collection.aggregate([
-        {"$match": {"student": student}},
-        {"$group": {"_id": "$summary_type", "count": {"$sum": 1}}}
-    ]))
 
-    return jsonify({
-        "quiz_trend": [
-            {"date": q["timestamp"].isoformat(), "percentage": q["percentage"]}
-            for q in quiz_trend
-        ],
-        "score_by_file": [
-            {"file": s["_id"], "avg": round(s["avg"], 2)}
-            for s in score_by_file
-        ],
-        "summary_types": [
-            {"type": s["_id"], "count": s["count"]} for s in summary_types
-        ]
-    })
+# ---------------- ADMIN ANALYTICS APIs ----------------
+def _quiz_filter_from_args():
+    return analytics.build_quiz_filter(
+        student=request.args.get("student"),
+        date_from=request.args.get("from"),
+        date_to=request.args.get("to")
+    )
 
 
-# ---------------- ADMIN ANALYTICS APIs ----------------
 @app.route('/get_analytics_all')
 @admin_required
 def get_analytics_all():
-    records = list(quiz_results_collection.find({}, {"_id": 0}))
-    return jsonify(records)
+    try:
+        limit = int(request.args.get("limit", config.ANALYTICS_PAGE_SIZE))
+        query = _quiz_filter_from_args()
+        with metrics.stage("mongo.quiz_results_page"):
+            records, next_cursor = analytics.quiz_results_page(
+                quiz_results_collection,
+                query,
+                limit=min(max(limit, 1), config.ANALYTICS_MAX_PAGE_SIZE),
+                after=request.args.get("after")
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"records": records, "next_cursor": next_cursor})
+
+
+@app.route('/export_analytics')
+@admin_required
+def export_analytics():
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    try:
+        query = _quiz_filter_from_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(analytics.export_quiz_results(
+            quiz_results_collection, query, fmt, config.ANALYTICS_EXPORT_BATCH_SIZE
+        )),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=quiz_results.{fmt}"}
+    )
+
+
+@app.route('/get_average_scores')
+@admin_required
+def get_average_scores():
+    with metrics.stage("mongo.rollups"):
+        rollups = analytics.all_rollups(db)
+    result = [
+        {"student": r["_id"], "avg": round(r["quiz_sum"] / r["quiz_count"], 2)}
+        for r in rollups if r.get("quiz_count")
+    ]
+    return jsonify(result)
 
 
 @app.route('/get_summary_counts')
 @admin_required
 def get_summary_counts():
-    pipeline = [
-        {"$group": {"_id": "$student", "count": {"$sum": 1}}}
+    with metrics.stage("mongo.rollups"):
+        rollups = analytics.all_rollups(db)
+    result = [
+        {"student": r["_id"], "count": r["summary_count"]}
+        for r in rollups if r.get("summary_count")
     ]
-    data = list(summaries_collection.aggregate(pipeline))
-    result = [{"student": d["_id"], "count": d["count"]} for d in data]
     return jsonify(result)
 
 
+# ---------------- METRICS ----------------
+def _collect_metrics():
+    """Cache and write-buffer counters, read from their stats() at scrape time."""
+    caches = {
+        "extracted_text": utils.extraction_cache_stats(),
+        "summaries": content_processor.summary_cache_stats(),
+    }
+    if _bot is not None:
+        caches["vector_stores"] = _bot.vector_stores.stats()
+        answers = _bot.answer_cache.stats()
+        caches["answers"] = {"hits": answers["exact_hits"] + answers["semantic_hits"], "misses": answers["misses"]}
+
+    def ratio(s):
+        lookups = s["hits"] + s["misses"]
+        return s["hits"] / lookups if lookups else 0.0
+
+    buffer = writer.stats()
+    return [
+        ("educademy_cache_hits_total", "counter", "Cache hits.",
+         [({"cache": name}, s["hits"]) for name, s in caches.items()]),
+        ("educademy_cache_misses_total", "counter", "Cache misses.",
+         [({"cache": name}, s["misses"]) for name, s in caches.items()]),
+        ("educademy_cache_hit_ratio", "gauge", "Cache hits / lookups since start.",
+         [({"cache": name}, ratio(s)) for name, s in caches.items()]),
+        ("educademy_write_buffer_depth", "gauge", "Operations waiting in the write buffer.",
+         [({}, buffer["queue_depth"])]),
+        ("educademy_write_buffer_sync_fallbacks_total", "counter", "Writes done synchronously because the buffer was full.",
+         [({}, buffer["sync_fallbacks"])]),
+        ("educademy_write_buffer_failed_total", "counter", "Buffered writes that failed.",
+         [({}, buffer["failed"])]),
+        ("educademy_write_buffer_retries_total", "counter", "Buffered write attempts that were retried.",
+         [({}, buffer["retries"])]),
+    ]
+
+
+metrics.register_collector(_collect_metrics)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/health')
 def health():
     return jsonify({"status": "ok"})
 
 
+@app.route('/ready')
+def ready():
+    components = {
+        "embedding_model": embedding_service_status(),
+        "chatbot": "loaded" if _bot is not None else "not_loaded",
+        "database": "ready" if _database_ready.is_set() else "pending",
+    }
+    if not _warmed_up.is_set():
+        return jsonify({"status": "warming_up", "components": components}), 503
+    if components != {"embedding_model": "loaded", "chatbot": "loaded", "database": "ready"}:
+        # Warm-up failed (or is disabled and nothing has loaded yet), or Mongo is not set up.
+        return jsonify({"status": "not_ready", "components": components}), 503
+    return jsonify({"status": "ready", "components": components, "write_buffer": writer.stats()})
+
+
 if __name__ == '__main__':
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     app.run(debug=True, port=5000)
@@ -0,0 +1,143 @@
+"""
+ANN index benchmark: flat vs. HNSW vs. IVF-PQ at growing corpus sizes.
+
+For each corpus size and index type this builds the index the way the app
+does (modules.vector_index.build_index, including IVF-PQ training and the
+configured efSearch/nprobe) and reports:
+  * build_seconds   - training + adding all vectors
+  * p50_ms, p95_ms  - single-query search latency
+  * mbytes          - approximate index memory (vector_index.index_nbytes)
+  * recall@k        - overlap of the top-k with exact (flat) search
+
+By default the corpus is synthetic: unit-normalized vectors drawn around
+random cluster centres, which behaves much like sentence embeddings. Pass
+--vectors with a .npy file of real chunk embeddings to use those instead
+(queries are then sampled from the file and perturbed slightly).
+
+Usage:
+    python benchmarks/ann_index.py
+    python benchmarks/ann_index.py --sizes 10000 100000 --dim 1024 --k 10
+    python benchmarks/ann_index.py --vectors chunks.npy --types flat hnsw
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import vector_index
+
+
+def _normalize(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _synthetic_corpus(size, dim, num_queries, rng):
+    centres = rng.standard_normal((max(1, size // 100), dim)).astype(np.float32)
+    labels = rng.integers(len(centres), size=size)
+    corpus = _normalize(centres[labels] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32))
+    query_labels = rng.integers(len(centres), size=num_queries)
+    queries = _normalize(centres[query_labels] + 0.6 * rng.standard_normal((num_queries, dim)).astype(np.float32))
+    return corpus, queries
+
+
+def _file_corpus(path, size, num_queries, rng):
+    vectors = np.load(path).astype(np.float32)
+    if size < len(vectors):
+        vectors = vectors[rng.choice(len(vectors), size, replace=False)]
+    picks = vectors[rng.integers(len(vectors), size=num_queries)]
+    queries = _normalize(picks + 0.05 * rng.standard_normal(picks.shape).astype(np.float32))
+    return np.ascontiguousarray(vectors), queries
+
+
+def _recall(found, truth, k):
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return round(hits / (len(truth) * k), 3)
+
+
+def benchmark_index(index_type, corpus, queries, truth, k, threads):
+    t0 = time.perf_counter()
+    index = vector_index.build_index(corpus, index_type)
+    build_seconds = time.perf_counter() - t0
+
+    build_threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(threads)
+    try:
+        index.search(queries[:1], k)  # warm-up
+        latencies = []
+        found = []
+        for q in queries:
+            t0 = time.perf_counter()
+            _, ids = index.search(q[None, :], k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found.append(ids[0])
+    finally:
+        faiss.omp_set_num_threads(build_threads)
+
+    return {
+        "index": index_type,
+        "built_as": type(index).__name__,
+        "size": len(corpus),
+        "build_seconds": round(build_seconds, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "mbytes": round(vector_index.index_nbytes(index) / 1e6, 1),
+        f"recall@{k}": _recall(found, truth, k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="*", type=int, default=[5000, 50000, 200000])
+    parser.add_argument("--types", nargs="*", default=list(vector_index.INDEX_TYPES))
+    parser.add_argument("--dim", type=int, default=384, help="vector size for the synthetic corpus")
+    parser.add_argument("--vectors", help=".npy file of real embeddings to use instead of synthetic data")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=1, help="faiss OpenMP threads while searching (1 = per-request latency)")
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    for size in args.sizes:
+        if args.vectors:
+            corpus, queries = _file_corpus(args.vectors, size, args.queries, rng)
+        else:
+            corpus, queries = _synthetic_corpus(size, args.dim, args.queries, rng)
+
+        exact = faiss.IndexFlatL2(corpus.shape[1])
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+
+        for index_type in args.types:
+            try:
+                result = benchmark_index(index_type, corpus, queries, truth, args.k, args.threads)
+            except Exception as e:
+                result = {"index": index_type, "size": size, "error": str(e)}
+            results.append(result)
+            print(json.dumps(result), flush=True)
+
+    recall_key = f"recall@{args.k}"
+    header = f"{'size':>8} {'index':<6} {'p50 ms':>8} {'p95 ms':>8} {'MB':>8} {recall_key:>10} {'build s':>8}"
+    print("\n" + header + "\n" + "-" * len(header))
+    for r in results:
+        if "error" in r:
+            print(f"{r['size']:>8} {r['index']:<6} error: {r['error'][:60]}")
+        else:
+            print(f"{r['size']:>8} {r['index']:<6} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['mbytes']:>8} "
+                  f"{r[recall_key]:>10} {r['build_seconds']:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Embedding profile benchmark: throughput vs. retrieval quality on CPU.
+
+For each profile in config.EMBEDDING_PROFILES this loads the model the way the
+app does (EmbeddingService, including int8 quantization and thread settings)
+and reports:
+  * load_seconds     - model load (+ quantization) time
+  * chunks_per_sec   - encode throughput on ~1000-character chunks
+  * recall@1, @3     - retrieval recall on the fixed corpus in
+                       benchmarks/data/retrieval_corpus.json
+
+Usage:
+    python benchmarks/embedding_profiles.py
+    python benchmarks/embedding_profiles.py --profiles default int8 small --chunks 256
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules import config
+from modules.embedding_service import EmbeddingService
+
+CORPUS_PATH = os.path.join(ROOT, "benchmarks", "data", "retrieval_corpus.json")
+
+
+def _load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _throughput_chunks(passages, count, chunk_chars=1000):
+    """Build `count` chunks of about `chunk_chars` characters from the corpus text."""
+    text = " ".join(p["text"] for p in passages)
+    while len(text) < chunk_chars * 2:
+        text += " " + text
+    chunks = []
+    for i in range(count):
+        start = (i * 137) % (len(text) - chunk_chars)
+        chunks.append(text[start:start + chunk_chars])
+    return chunks
+
+
+def _recall(service, corpus, ks=(1, 3)):
+    passages = corpus["passages"]
+    queries = corpus["queries"]
+    ids = [p["id"] for p in passages]
+
+    doc_vecs = service.encode([p["text"] for p in passages])
+    query_vecs = service.encode([q["text"] for q in queries])
+    ranking = np.argsort(-(query_vecs @ doc_vecs.T), axis=1)
+
+    recall = {}
+    for k in ks:
+        hits = sum(q["relevant"] in [ids[j] for j in ranking[i, :k]] for i, q in enumerate(queries))
+        recall[f"recall@{k}"] = round(hits / len(queries), 3)
+    return recall
+
+
+def benchmark_profile(name, profile, corpus, num_chunks, device):
+    t0 = time.perf_counter()
+    service = EmbeddingService(
+        profile["model_id"],
+        device=device,
+        max_batch_size=config.EMBEDDING_MAX_BATCH_SIZE,
+        batch_window_ms=0,
+        quantize=profile["quantize"],
+        threads=profile["threads"],
+    )
+    load_seconds = time.perf_counter() - t0
+
+    chunks = _throughput_chunks(corpus["passages"], num_chunks)
+    service.encode(chunks[:config.EMBEDDING_MAX_BATCH_SIZE])  # warm-up
+    t0 = time.perf_counter()
+    service.encode(chunks)
+    encode_seconds = time.perf_counter() - t0
+
+    result = {
+        "profile": name,
+        "model_id": profile["model_id"],
+        "quantize": profile["quantize"],
+        "threads": profile["threads"],
+        "load_seconds": round(load_seconds, 2),
+        "chunks_per_sec": round(num_chunks / encode_seconds, 1),
+    }
+    result.update(_recall(service, corpus))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="*", default=list(config.EMBEDDING_PROFILES))
+    parser.add_argument("--chunks", type=int, default=128, help="chunks to encode for the throughput test")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = _load_corpus()
+    results = []
+    for name in args.profiles:
+        try:
+            result = benchmark_profile(name, config.EMBEDDING_PROFILES[name], corpus, args.chunks, args.device)
+        except Exception as e:
+            result = {"profile": name, "error": str(e)}
+        results.append(result)
+        print(json.dumps(result), flush=True)
+
+    header = f"{'profile':<12} {'chunks/s':>9} {'recall@1':>9} {'recall@3':>9} {'load s':>7}"
+    print("\n" + header + "\n" + "-" * len(header))
+    for r in results:
+        if "error" in r:
+            print(f"{r['profile']:<12} error: {r['error'][:60]}")
+        else:
+            print(f"{r['profile']:<12} {r['chunks_per_sec']:>9} {r['recall@1']:>9} {r['recall@3']:>9} {r['load_seconds']:>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
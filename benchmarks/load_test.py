@@ -0,0 +1,393 @@
+"""
+Offline load test for the Educademy app.
+
+Runs the real Flask app in-process on a threaded WSGI server, with:
+  * a stub Ollama HTTP server (configurable first-token latency and token
+    rate, streaming and non-streaming /api/generate), and
+  * mongomock standing in for MongoDB,
+then drives each endpoint scenario with N requests at C concurrent clients
+and reports p50/p95/p99 latency, requests/sec and errors per scenario.
+
+Every run is saved under benchmarks/results/ (git-ignored) so runs can be
+compared.
+
+mongomock is a benchmark-only dependency:
+    pip install -r benchmarks/requirements.txt
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --scenarios ask_ai ask_ai_stream --concurrency 16 --requests 400
+    python benchmarks/load_test.py --llm-latency-ms 50 --tokens-per-sec 200 --response-tokens 120
+    python benchmarks/load_test.py --compare benchmarks/results/20250101-120000.json
+
+Request payloads are unique by default so the summary, extraction and answer
+caches miss; pass --repeat-payloads to measure the cached paths instead.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+CORPUS_PATH = os.path.join(ROOT, "benchmarks", "data", "retrieval_corpus.json")
+
+SCENARIOS = [
+    "login", "summarize", "generate_quiz", "generate_quiz_stream", "ask_ai", "ask_ai_stream",
+    "analytics_summary", "admin_analytics",
+]
+
+STUDENT_PASSWORD = "load-test"
+MCQ_BLOCK = """###
+Q: Which process converts light energy into chemical energy?
+A) Respiration
+B) Photosynthesis
+C) Fermentation
+D) Digestion
+Answer: Photosynthesis
+"""
+MCQ_QUESTIONS = [
+    ("Which process converts light energy into chemical energy?",
+     ["Respiration", "Photosynthesis", "Fermentation", "Digestion"], "Photosynthesis"),
+    ("Where in the cell does the Calvin cycle take place?",
+     ["Stroma", "Nucleus", "Ribosome", "Cell wall"], "Stroma"),
+    ("Which gas do plants release as a by-product?",
+     ["Nitrogen", "Methane", "Oxygen", "Helium"], "Oxygen"),
+    ("What pigment gives leaves their green colour?",
+     ["Melanin", "Carotene", "Haemoglobin", "Chlorophyll"], "Chlorophyll"),
+    ("How do roots mainly take up water from soil?",
+     ["Osmosis", "Combustion", "Evaporation", "Condensation"], "Osmosis"),
+]
+
+
+# ---------------- STUB OLLAMA ----------------
+class StubOllama:
+    """Answers /api/generate like Ollama, with simulated generation timing."""
+
+    def __init__(self, latency_ms: float, tokens_per_sec: float, response_tokens: int):
+        self.latency = latency_ms / 1000.0
+        self.token_delay = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        self.response_tokens = response_tokens
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with stub._lock:
+                    stub.requests += 1
+                tokens = stub.tokens_for(payload)
+                time.sleep(stub.latency)
+
+                if payload.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for token in tokens:
+                        time.sleep(stub.token_delay)
+                        self._chunk({"response": token, "done": False})
+                    self._chunk({"response": "", "done": True, "eval_count": len(tokens)})
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+
+                time.sleep(stub.token_delay * len(tokens))
+                body = json.dumps({"response": "".join(tokens), "done": True, "eval_count": len(tokens)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, obj):
+                data = (json.dumps(obj) + "\n").encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="stub-ollama", daemon=True).start()
+
+    def tokens_for(self, payload):
+        """Split a canned completion into `response_tokens` pieces."""
+        if payload.get("format") is not None:
+            text = json.dumps({"questions": [
+                {"question": q, "options": options, "answer": answer} for q, options, answer in MCQ_QUESTIONS
+            ]})
+        elif "quiz generator" in payload.get("prompt", ""):
+            text = MCQ_BLOCK * 5
+        else:
+            text = " ".join(["- Plants turn light into stored chemical energy."] * max(self.response_tokens // 8, 1))
+
+        size = max(len(text) // max(self.response_tokens, 1), 1)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ---------------- APP UNDER TEST ----------------
+def _start_app(ollama_url: str, warmup: bool):
+    """Import app.py against mongomock and the stub Ollama, serve it on a free port."""
+    import mongomock
+    import mongomock.collection
+    import pymongo
+
+    # Newer pymongo passes `sort=` to bulk builders, which mongomock does not accept yet.
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    mongomock.collection.BulkOperationBuilder.add_update = (
+        lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+    )
+    pymongo.MongoClient = mongomock.MongoClient
+
+    os.environ["WARMUP_ON_START"] = "1" if warmup else "0"
+    from modules import config
+    config.OLLAMA_BASE_URL = ollama_url
+
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return app_module, server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _seed(app_module, students: int, quiz_results: int):
+    from flask_bcrypt import generate_password_hash
+
+    hashed = generate_password_hash(STUDENT_PASSWORD).decode("utf-8")
+    names = [f"student{i}" for i in range(students)]
+    app_module.users_collection.insert_many(
+        [{"username": n, "password": hashed, "role": "user", "created_at": datetime.utcnow()} for n in names]
+        + [{"username": "admin", "password": hashed, "role": "admin", "created_at": datetime.utcnow()}]
+    )
+    app_module.quiz_results_collection.insert_many([
+        {
+            "student": random.choice(names),
+            "filename": f"notes{i % 7}.pdf",
+            "score": i % 6,
+            "total": 5,
+            "percentage": (i % 6) * 20.0,
+            "timestamp": datetime.utcnow(),
+        }
+        for i in range(quiz_results)
+    ])
+    return names
+
+
+# ---------------- LOAD GENERATION ----------------
+class Client:
+    """One simulated user with its own cookie jar and keep-alive connection."""
+
+    def __init__(self, base_url: str, username: str):
+        import requests
+
+        self.base_url = base_url
+        self.username = username
+        self.http = requests.Session()
+
+    def login(self):
+        r = self.http.post(self.base_url + "/login",
+                           data={"username": self.username, "password": STUDENT_PASSWORD},
+                           allow_redirects=False)
+        return r.status_code == 302
+
+
+def _passages():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [p["text"] for p in json.load(f)["passages"]]
+
+
+def _make_request(scenario, client, n, passages, repeat):
+    """Issue one request; return True if it succeeded."""
+    url = client.base_url
+    tag = "" if repeat else f" [request {n}]"
+    text = " ".join(passages[(n + i) % len(passages)] for i in range(4)) + tag
+
+    if scenario == "login":
+        return client.login()
+    if scenario == "summarize":
+        r = client.http.post(url + "/summarize", data={"text": text})
+    elif scenario == "generate_quiz":
+        r = client.http.post(url + "/generate_quiz", data={"text": text})
+    elif scenario == "generate_quiz_stream":
+        r = client.http.post(url + "/generate_quiz/stream", data={"text": text}, stream=True)
+        with r:
+            lines = [json.loads(line) for line in r.iter_lines() if line]
+        return r.status_code == 200 and bool(lines) and lines[-1].get("done")
+    elif scenario == "ask_ai":
+        r = client.http.post(url + "/ask-ai", data={"question": "What is photosynthesis?" + tag})
+    elif scenario == "ask_ai_stream":
+        r = client.http.post(url + "/ask-ai", data={"question": "What is photosynthesis?" + tag, "stream": "1"},
+                             stream=True)
+        with r:
+            lines = [json.loads(line) for line in r.iter_lines() if line]
+        return r.status_code == 200 and bool(lines) and lines[-1].get("done")
+    elif scenario == "analytics_summary":
+        r = client.http.get(url + f"/analytics_summary/{client.username}")
+    elif scenario == "admin_analytics":
+        r = client.http.get(url + "/get_analytics_all?limit=100")
+    else:
+        raise ValueError(f"Unknown scenario '{scenario}'")
+    return r.status_code == 200
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(int(round(pct / 100.0 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+def run_scenario(scenario, base_url, usernames, num_requests, concurrency, passages, repeat):
+    clients = []
+    for i in range(concurrency):
+        username = "admin" if scenario == "admin_analytics" else usernames[i % len(usernames)]
+        client = Client(base_url, username)
+        if scenario != "login" and not client.login():
+            raise RuntimeError(f"Could not log in as {username}")
+        clients.append(client)
+
+    counter = itertools.count()
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def worker(client):
+        nonlocal errors
+        while True:
+            n = next(counter)
+            if n >= num_requests:
+                return
+            t0 = time.perf_counter()
+            try:
+                ok = _make_request(scenario, client, n, passages, repeat)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                errors += not ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, clients))
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 1)
+    return {
+        "scenario": scenario,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": ms(_percentile(latencies, 50)),
+        "p95_ms": ms(_percentile(latencies, 95)),
+        "p99_ms": ms(_percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+# ---------------- REPORTING ----------------
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _print_table(results, baseline=None):
+    base = {r["scenario"]: r for r in (baseline or {}).get("results", [])}
+    header = f"{'scenario':<18} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print("\n" + header + "\n" + "-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<18} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+        old = base.get(r["scenario"])
+        if old:
+            delta = lambda key: f"{(r[key] - old[key]) / old[key] * 100:+.0f}%" if old[key] else "n/a"
+            print(f"{'  vs baseline':<18} {'':>6} {'':>5} {delta('rps'):>8} "
+                  f"{delta('p50_ms'):>9} {delta('p95_ms'):>9} {delta('p99_ms'):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="stub Ollama time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=100, help="stub Ollama generation speed")
+    parser.add_argument("--response-tokens", type=int, default=60, help="tokens per stub completion")
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--seed-quiz-results", type=int, default=5000)
+    parser.add_argument("--repeat-payloads", action="store_true", help="reuse identical payloads (cache hits)")
+    parser.add_argument("--warmup", action="store_true", help="load the chatbot and embedding model before the run")
+    parser.add_argument("--label", default="", help="free-form note stored with the results")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    ollama = StubOllama(args.llm_latency_ms, args.tokens_per_sec, args.response_tokens)
+    app_module, server, base_url = _start_app(ollama.url, args.warmup)
+    usernames = _seed(app_module, args.students, args.seed_quiz_results)
+    if args.warmup:
+        app_module._warmed_up.wait()
+
+    passages = _passages()
+    results = []
+    for scenario in args.scenarios:
+        result = run_scenario(scenario, base_url, usernames, args.requests, args.concurrency,
+                              passages, args.repeat_payloads)
+        results.append(result)
+        print(json.dumps(result), flush=True)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": _git_commit(),
+        "label": args.label,
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "label")},
+        "ollama_requests": ollama.requests,
+        "results": results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_table(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.utcnow().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    server.shutdown()
+    ollama.close()
+
+
+if __name__ == "__main__":
+    main()
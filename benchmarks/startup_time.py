@@ -0,0 +1,80 @@
+"""
+Startup-time benchmark for the Educademy app.
+
+Measures, in fresh subprocesses:
+  * import time of app.py (what every worker pays before serving /login)
+  * time until /ready reports ready with background warm-up enabled
+
+Usage:
+    python benchmarks/startup_time.py --runs 5
+    python benchmarks/startup_time.py --max-import-seconds 3   # fail on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import time, json
+t0 = time.perf_counter()
+import app
+print(json.dumps({"import_seconds": time.perf_counter() - t0}))
+"""
+
+READY_PROBE = """
+import time, json
+t0 = time.perf_counter()
+import app
+imported = time.perf_counter() - t0
+client = app.app.test_client()
+while client.get("/ready").status_code != 200:
+    time.sleep(0.05)
+print(json.dumps({"import_seconds": imported, "ready_seconds": time.perf_counter() - t0}))
+"""
+
+
+def _run_probe(code, warmup):
+    env = dict(os.environ, WARMUP_ON_START="1" if warmup else "0")
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _describe(values):
+    return {
+        "median": round(statistics.median(values), 3),
+        "min": round(min(values), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--skip-ready", action="store_true", help="only measure import time")
+    parser.add_argument("--max-import-seconds", type=float, default=None,
+                        help="exit non-zero if the median import time exceeds this")
+    args = parser.parse_args()
+
+    imports = [_run_probe(IMPORT_PROBE, warmup=False)["import_seconds"] for _ in range(args.runs)]
+    report = {"fast_start_import_seconds": _describe(imports)}
+
+    if not args.skip_ready:
+        ready = [_run_probe(READY_PROBE, warmup=True)["ready_seconds"] for _ in range(args.runs)]
+        report["warm_up_ready_seconds"] = _describe(ready)
+
+    print(json.dumps(report, indent=2))
+
+    if args.max_import_seconds is not None and report["fast_start_import_seconds"]["median"] > args.max_import_seconds:
+        print(f"Import time regression: median above {args.max_import_seconds}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
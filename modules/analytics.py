@@ -0,0 +1,305 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+QUIZ_RESULT_FIELDS = ["student", "filename", "score", "total", "percentage", "timestamp"]
+
+
+def _parse_date(value: str, end_of_range: bool) -> datetime:
+    """Parse YYYY-MM-DD or an ISO datetime. A bare date used as an upper bound covers the whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end_of_range and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def build_quiz_filter(student: Optional[str] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None) -> Dict[str, Any]:
+    """Mongo filter for quiz results. Raises ValueError on a malformed date."""
+    query: Dict[str, Any] = {}
+    if student:
+        query["student"] = student
+
+    timestamp: Dict[str, datetime] = {}
+    if date_from:
+        timestamp["$gte"] = _parse_date(date_from, end_of_range=False)
+    if date_to:
+        bound = _parse_date(date_to, end_of_range=True)
+        timestamp["$lt" if len(date_to) == 10 else "$lte"] = bound
+    if timestamp:
+        query["timestamp"] = timestamp
+    return query
+
+
+def serialize_quiz_result(doc: Dict[str, Any]) -> Dict[str, Any]:
+    record = {field: doc.get(field) for field in QUIZ_RESULT_FIELDS}
+    if isinstance(record["timestamp"], datetime):
+        record["timestamp"] = record["timestamp"].isoformat()
+    return record
+
+
+def quiz_results_page(collection, query: Dict[str, Any], limit: int,
+                      after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of quiz results in `_id` order, plus the cursor for the next page.
+
+    Keyset pagination (`_id > after`) stays cheap however deep the admin
+    pages, unlike skip/offset. Raises ValueError on a malformed cursor.
+    """
+    if after:
+        try:
+            query = {**query, "_id": {"$gt": ObjectId(after)}}
+        except (InvalidId, TypeError):
+            raise ValueError("Invalid cursor")
+
+    # Fetch one extra document to learn whether another page exists.
+    docs = list(collection.find(query).sort("_id", 1).limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    next_cursor = str(docs[-1]["_id"]) if has_more else None
+    return [serialize_quiz_result(d) for d in docs], next_cursor
+
+
+def export_quiz_results(collection, query: Dict[str, Any], fmt: str, batch_size: int) -> Iterator[str]:
+    """Stream matching quiz results as NDJSON or CSV straight from the Mongo cursor."""
+    cursor = collection.find(query).sort("_id", 1).batch_size(batch_size)
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=QUIZ_RESULT_FIELDS)
+        writer.writeheader()
+        for i, doc in enumerate(cursor, 1):
+            writer.writerow(serialize_quiz_result(doc))
+            if i % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    lines = []
+    for doc in cursor:
+        lines.append(json.dumps(serialize_quiz_result(doc)) + "\n")
+        if len(lines) >= batch_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+# ---------------- INDEXES ----------------
+INDEXES = {
+    "users": [([("username", ASCENDING)], {"unique": True})],
+    "summaries": [([("student", ASCENDING), ("summary_type", ASCENDING)], {})],
+    "quiz_results": [
+        ([("student", ASCENDING), ("timestamp", ASCENDING)], {}),
+        ([("timestamp", ASCENDING)], {}),
+    ],
+    "student_file_rollups": [([("student", ASCENDING), ("file", ASCENDING)], {"unique": True})],
+    # Finished background jobs expire; unfinished ones have finished_at=None,
+    # which a TTL index ignores.
+    "jobs": [([("finished_at", ASCENDING)], {"expireAfterSeconds": config.JOB_RETENTION_SECONDS})],
+}
+
+
+def ensure_indexes(db) -> bool:
+    """Create the indexes the app's queries rely on. Safe to run on every start.
+
+    Returns False if Mongo could not be reached, so the caller can retry later.
+    """
+    try:
+        db.client.admin.command("ping")
+    except PyMongoError as e:
+        logger.warning(f"MongoDB is not reachable, indexes not created yet: {e}")
+        return False
+
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except PyMongoError as e:
+                logger.warning(f"Could not create index {keys} on '{collection}': {e}")
+    return True
+
+
+# ---------------- ROLLUPS ----------------
+# One `student_rollups` document per student (_id = username) holds summary
+# counts by type, the running quiz score sum/count and the latest
+# ANALYTICS_TREND_POINTS quiz results. Per-file averages live in
+# `student_file_rollups` as (student, file, sum, count), because file names
+# are not safe Mongo field names. Both are updated with $inc/$push on every
+# insert, so dashboards read them instead of aggregating raw history. The
+# updates go through the app's BulkWriter, so they land a moment after the
+# request that caused them.
+#
+# Students whose history predates the rollups are backfilled from the raw
+# collections once at start-up (see backfill_missing_rollups); until then their
+# dashboard is computed from the raw history without storing anything.
+# `backfilled` marks a rollup as complete. Backfills run on the BulkWriter
+# thread (`writer.call`), and each raw record is queued together with its
+# rollup update (`writer.group`), so a backfill sees either both or neither.
+
+def init_student_rollup(db, student: str):
+    """Start an empty, complete rollup for a brand-new student."""
+    db["student_rollups"].update_one(
+        {"_id": student},
+        {"$setOnInsert": {
+            "backfilled": True,
+            "summary_count": 0,
+            "summary_types": {},
+            "quiz_sum": 0.0,
+            "quiz_count": 0,
+            "quiz_trend": [],
+        }},
+        upsert=True
+    )
+
+
+def record_summary(writer, student: str, summary_type: str):
+    writer.update_one(
+        "student_rollups",
+        {"_id": student},
+        {"$inc": {"summary_count": 1, f"summary_types.{summary_type}": 1}},
+        upsert=True
+    )
+
+
+def record_quiz_result(writer, record: Dict[str, Any]):
+    student = record["student"]
+    writer.update_one(
+        "student_rollups",
+        {"_id": student},
+        {
+            "$inc": {"quiz_sum": record["percentage"], "quiz_count": 1},
+            "$push": {"quiz_trend": {
+                "$each": [{"timestamp": record["timestamp"], "percentage": record["percentage"]}],
+                "$slice": -config.ANALYTICS_TREND_POINTS,
+            }},
+        },
+        upsert=True
+    )
+    writer.update_one(
+        "student_file_rollups",
+        {"student": student, "file": record["filename"]},
+        {"$inc": {"sum": record["percentage"], "count": 1}},
+        upsert=True
+    )
+
+
+def _compute_rollup(db, student: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """A student's rollup and per-file rollups, computed from the raw summaries and quiz_results."""
+    quiz_results = db["quiz_results"]
+
+    summary_types = {
+        s["_id"]: s["count"]
+        for s in db["summaries"].aggregate([
+            {"$match": {"student": student}},
+            {"$group": {"_id": "$summary_type", "count": {"$sum": 1}}}
+        ])
+        if s["_id"] is not None
+    }
+
+    by_file = list(quiz_results.aggregate([
+        {"$match": {"student": student}},
+        {"$group": {"_id": "$filename", "sum": {"$sum": "$percentage"}, "count": {"$sum": 1}}}
+    ]))
+
+    trend = list(
+        quiz_results.find(
+            {"student": student},
+            {"_id": 0, "percentage": 1, "timestamp": 1}
+        ).sort("timestamp", DESCENDING).limit(config.ANALYTICS_TREND_POINTS)
+    )
+    trend.reverse()
+
+    rollup = {
+        "_id": student,
+        "backfilled": True,
+        "summary_count": sum(summary_types.values()),
+        "summary_types": summary_types,
+        "quiz_sum": float(sum(f["sum"] for f in by_file)),
+        "quiz_count": sum(f["count"] for f in by_file),
+        "quiz_trend": trend,
+    }
+    files = [{"file": f["_id"], "sum": f["sum"], "count": f["count"]} for f in by_file]
+    return rollup, files
+
+
+def backfill_student_rollup(db, student: str) -> Dict[str, Any]:
+    """Rebuild and store a student's rollups from the raw history.
+
+    Run it through `writer.call` so no queued record or rollup update for
+    the student is half-applied while it reads.
+    """
+    rollup, files = _compute_rollup(db, student)
+    db["student_rollups"].replace_one({"_id": student}, rollup, upsert=True)
+
+    # Upsert per file rather than delete+insert, so it cannot collide with
+    # another upsert on the unique (student, file) index.
+    file_rollups = db["student_file_rollups"]
+    if files:
+        file_rollups.bulk_write([
+            UpdateOne({"student": student, "file": f["file"]},
+                      {"$set": {"sum": f["sum"], "count": f["count"]}},
+                      upsert=True)
+            for f in files
+        ], ordered=False)
+    file_rollups.delete_many({"student": student, "file": {"$nin": [f["file"] for f in files]}})
+    return rollup
+
+
+def student_summary(db, student: str) -> Dict[str, Any]:
+    """The /analytics_summary payload, read from the rollups.
+
+    A student without a complete rollup yet (or an unknown name) is
+    computed from the raw history; reads never create rollup documents.
+    """
+    rollup = db["student_rollups"].find_one({"_id": student})
+    if rollup is None or not rollup.get("backfilled"):
+        rollup, files = _compute_rollup(db, student)
+    else:
+        files = db["student_file_rollups"].find({"student": student}, {"_id": 0, "file": 1, "sum": 1, "count": 1})
+
+    return {
+        "quiz_trend": [
+            {"date": q["timestamp"].isoformat(), "percentage": q["percentage"]}
+            for q in rollup["quiz_trend"]
+        ],
+        "score_by_file": [
+            {"file": f["file"], "avg": round(f["sum"] / f["count"], 2)}
+            for f in files if f["count"]
+        ],
+        "summary_types": [
+            {"type": t, "count": c} for t, c in rollup["summary_types"].items()
+        ]
+    }
+
+
+def backfill_missing_rollups(db, writer) -> int:
+    """Backfill every registered user whose rollup is missing or incomplete.
+
+    Run once at start-up; returns how many students were backfilled.
+    """
+    complete = {r["_id"] for r in db["student_rollups"].find({"backfilled": True}, {"_id": 1})}
+    backfilled = 0
+    for user in db["users"].find({}, {"_id": 0, "username": 1}):
+        if user["username"] not in complete:
+            writer.call(backfill_student_rollup, db, user["username"])
+            backfilled += 1
+    return backfilled
+
+
+def all_rollups(db) -> List[Dict[str, Any]]:
+    return list(db["student_rollups"].find({}, {"quiz_trend": 0}))
@@ -0,0 +1,111 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+
+class SemanticAnswerCache:
+    """Caches chatbot answers per (mode, document) scope.
+
+    A question hits if its normalized text was seen before in the same scope,
+    or if its embedding is at least `similarity_threshold` similar to a cached
+    question there (paraphrases). RAG answers for different documents and
+    normal-chat answers never mix. Entries expire after `ttl_seconds`, and the
+    least recently used are dropped beyond `max_entries`.
+
+    `embed` may return None (e.g. while the embedding service is busy with
+    bulk work); the question is then only matched exactly. A question is not
+    embedded at all when its scope has nothing to compare against.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float,
+                 embed: Callable[[str], Optional[np.ndarray]]):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._embed = embed
+
+        # (mode, doc_hash, normalized question) -> (answer, vector, stored_at)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[str, Optional[np.ndarray], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return now - stored_at > self.ttl_seconds
+
+    def lookup(self, mode: str, doc_hash: str, question: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return (cached answer or None, question embedding to pass to `store`)."""
+        key = (mode, doc_hash, normalize_question(question))
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[2], now):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[0], entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+            scope = [
+                (k, e) for k, e in self._entries.items()
+                if k[0] == mode and k[1] == doc_hash and e[1] is not None and not self._expired(e[2], now)
+            ]
+
+        if not scope:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        vector = self._embed(question)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        sims = np.stack([e[1] for _, e in scope]) @ vector
+        best = int(np.argmax(sims))
+        with self._lock:
+            if sims[best] >= self.similarity_threshold:
+                self.semantic_hits += 1
+                best_key = scope[best][0]
+                if best_key in self._entries:
+                    self._entries.move_to_end(best_key)
+                return scope[best][1][0], vector
+            self.misses += 1
+        return None, vector
+
+    def store(self, mode: str, doc_hash: str, question: str, answer: str, vector: Optional[np.ndarray] = None):
+        key = (mode, doc_hash, normalize_question(question))
+        if vector is None:
+            vector = self._embed(question)
+        with self._lock:
+            self._entries[key] = (answer, vector, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,284 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+# Applying an update made only of these twice leaves the same document.
+_IDEMPOTENT_UPDATE_OPERATORS = {"$set", "$setOnInsert", "$unset", "$min", "$max"}
+
+
+class _Call:
+    """A function queued with `BulkWriter.call`, run on the writer thread in queue order."""
+
+    def __init__(self, func: Callable, args: tuple):
+        self.func = func
+        self.args = args
+        self.future: Future = Future()
+
+    def run(self):
+        try:
+            self.future.set_result(self.func(*self.args))
+        except Exception as e:
+            self.future.set_exception(e)
+
+
+class BulkWriter:
+    """Write-behind buffer for fire-and-forget Mongo writes (audit logs, rollups).
+
+    Request handlers enqueue inserts/updates and return immediately; one
+    background thread drains the queue into ordered `bulk_write` calls per
+    collection once `max_batch` operations are waiting or `flush_seconds`
+    have passed. Operations on the same collection keep their enqueue order,
+    so e.g. a logout update always lands after its login insert.
+
+    Inserted documents get a client-side `_id`, which makes a retried insert
+    safe: duplicate-key errors are skipped rather than double-writing. Other
+    failures are retried `max_retries` times with exponential backoff from
+    `retry_backoff` seconds. If no server could be selected nothing was sent,
+    so the whole batch is retried; after any other error (e.g. a connection
+    dropped mid-batch) only idempotent operations are retried, because an
+    `$inc`/`$push` that already landed would be applied twice. Operations
+    that are not retried, or still fail, are logged and counted as failed.
+
+    The queue holds at most `max_queue` operations. When it is full, callers
+    wait up to `enqueue_timeout` seconds and then write synchronously, so
+    records are never dropped (at the cost of ordering relative to what is
+    still queued); `stats()` counts those fallbacks.
+
+    `call(func)` runs a function on the writer thread once everything queued
+    before it is written and before anything queued after it, e.g. rebuilding
+    a rollup from the raw records without racing the `$inc`s still in the
+    queue. Operations enqueued inside `group()` stay contiguous, so a call
+    never lands between a record and its rollup update.
+    """
+
+    def __init__(self, db, max_batch: int, flush_seconds: float, max_queue: int, enqueue_timeout: float,
+                 max_retries: int = 3, retry_backoff: float = 0.5):
+        self.db = db
+        self.max_batch = max_batch
+        self.flush_seconds = flush_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "duplicates_skipped": 0,
+            "failed": 0,
+            "retries": 0,
+            "sync_fallbacks": 0,
+            "max_queue_depth": 0,
+        }
+        self._closed = False
+        self._group_lock = threading.RLock()
+
+        self._worker = threading.Thread(target=self._run, name="bulk-writer", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # ---------------- PUBLIC API ----------------
+    def insert_one(self, collection: str, document: Dict[str, Any]) -> ObjectId:
+        """Queue an insert and return the `_id` it will be stored under."""
+        document = {"_id": ObjectId(), **document}
+        self._enqueue(collection, InsertOne(document), retryable=True)
+        return document["_id"]
+
+    def update_one(self, collection: str, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        retryable = set(update) <= _IDEMPOTENT_UPDATE_OPERATORS
+        self._enqueue(collection, UpdateOne(filter, update, upsert=upsert), retryable=retryable)
+
+    @contextmanager
+    def group(self):
+        """Keep the operations queued in this block next to each other in the queue."""
+        with self._group_lock:
+            yield
+
+    def call(self, func: Callable, *args) -> Any:
+        """Run `func(*args)` on the writer thread between what was queued before and after, and return its result."""
+        if self._closed:
+            return func(*args)
+        pending = _Call(func, args)
+        with self._group_lock:
+            self._queue.put(pending)
+        return pending.future.result()
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join(timeout=30)
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {**self._stats, "queue_depth": self._queue.qsize()}
+
+    # ---------------- INTERNALS ----------------
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def _enqueue(self, collection: str, op, retryable: bool):
+        if self._closed:
+            self._write_batch([(collection, op, retryable)])
+            return
+        try:
+            with self._group_lock:
+                self._queue.put((collection, op, retryable), timeout=self.enqueue_timeout)
+        except queue.Full:
+            logger.warning("Write buffer is full; writing synchronously.")
+            self._count("sync_fallbacks")
+            self._write_batch([(collection, op, retryable)])
+            return
+
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            if isinstance(item, _Call):
+                item.run()
+                self._queue.task_done()
+                continue
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            stop = False
+            call = None
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, _Call):
+                    # Runs after this batch is written, before anything queued behind it.
+                    call = item
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+            if call is not None:
+                call.run()
+                self._queue.task_done()
+            if stop:
+                # Drain whatever was queued behind the sentinel before exiting.
+                self._drain()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, _Call):
+                if batch:
+                    self._write_batch(batch)
+                    batch = []
+                item.run()
+            elif item is not None:
+                batch.append(item)
+            self._queue.task_done()
+        if batch:
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[tuple]):
+        by_collection: "OrderedDict[str, list]" = OrderedDict()
+        for collection, op, retryable in batch:
+            by_collection.setdefault(collection, []).append((op, retryable))
+        for collection, ops in by_collection.items():
+            try:
+                self._write(collection, ops)
+            except Exception:
+                # Never let one bad batch stop the writer thread.
+                logger.exception(f"Unexpected error writing {len(ops)} buffered operations to '{collection}'")
+                self._drop(collection, [op for op, _ in ops])
+        self._count("batches")
+
+    def _drop(self, collection: str, ops: list):
+        for op in ops:
+            logger.error(f"Dropped write to '{collection}': {op!r}")
+        self._count("failed", len(ops))
+
+    def _write(self, collection: str, ops: List[tuple]):
+        """Write (operation, retryable) pairs in order."""
+        attempt = 0
+        while ops:
+            try:
+                self.db[collection].bulk_write([op for op, _ in ops], ordered=True)
+                self._count("written", len(ops))
+                return
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors") or []
+                if not errors:
+                    # Only the write concern failed; the writes themselves were applied.
+                    logger.warning(f"Buffered write to '{collection}' missed its write concern: "
+                                   f"{e.details.get('writeConcernErrors')}")
+                    self._count("written", len(ops))
+                    return
+                error = errors[0]
+                index = error["index"]
+                self._count("written", index)
+                if error.get("code") == DUPLICATE_KEY:
+                    self._count("duplicates_skipped")
+                else:
+                    logger.error(f"Buffered write to '{collection}' failed: {error.get('errmsg')}")
+                    self._count("failed")
+                ops = ops[index + 1:]
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.exception(f"Buffered write of {len(ops)} operations to '{collection}' failed; dropping them")
+                    self._drop(collection, [op for op, _ in ops])
+                    return
+                if not isinstance(e, ServerSelectionTimeoutError):
+                    # Part of the batch may have been applied: only re-run what is safe to repeat.
+                    unsafe = [op for op, retryable in ops if not retryable]
+                    if unsafe:
+                        logger.error(f"Buffered write to '{collection}' was interrupted ({e}); "
+                                     f"not retrying {len(unsafe)} non-idempotent operations")
+                        self._drop(collection, unsafe)
+                        ops = [(op, retryable) for op, retryable in ops if retryable]
+                        if not ops:
+                            return
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                logger.warning(f"Buffered write of {len(ops)} operations to '{collection}' failed ({e}); "
+                               f"retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                self._count("retries")
+                time.sleep(delay)
@@ -3,13 +3,25 @@ Central configuration file for the Educademy application.
 This version is optimized to use different Ollama models for different tasks.
 """
 
-UPLOAD_DIRECTORY = "uploads"
-
 LOG_FILE = "app.log"
 LOG_LEVEL = "INFO"
 
 EMBEDDING_MODEL_ID = "BAAI/bge-large-en-v1.5"
 
+# CPU embedding profiles. "int8" applies dynamic int8 quantization to the
+# model's linear layers (CPU only); "threads" sets torch's intra-op thread
+# count (None keeps torch's default). Compare them with
+# benchmarks/embedding_profiles.py before switching EMBEDDING_PROFILE.
+EMBEDDING_PROFILES = {
+    "default":    {"model_id": EMBEDDING_MODEL_ID,       "quantize": False, "threads": None},
+    "int8":       {"model_id": EMBEDDING_MODEL_ID,       "quantize": True,  "threads": None},
+    "base":       {"model_id": "BAAI/bge-base-en-v1.5",  "quantize": False, "threads": None},
+    "base-int8":  {"model_id": "BAAI/bge-base-en-v1.5",  "quantize": True,  "threads": None},
+    "small":      {"model_id": "BAAI/bge-small-en-v1.5", "quantize": False, "threads": None},
+    "small-int8": {"model_id": "BAAI/bge-small-en-v1.5", "quantize": True,  "threads": None},
+}
+EMBEDDING_PROFILE = "default"
+
 CHATBOT_MODEL_ID = "llama3.2"
 
 
@@ -17,4 +29,150 @@ PROCESSING_MODEL_ID = "llama3.2"
 
 MAX_MCQS_TO_GENERATE = 5
 
-TOP_K_RETRIEVED_CHUNKS = 3
\ No newline at end of file
+TOP_K_RETRIEVED_CHUNKS = 3
+
+# Memory budget (bytes) for the shared registry of per-document FAISS stores.
+VECTOR_STORE_MEMORY_BUDGET_BYTES = 512 * 1024 * 1024
+
+# On-disk FAISS index cache, keyed by document hash and shared between workers.
+INDEX_CACHE_DIRECTORY = "index_cache"
+INDEX_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Background job pool for summaries and quizzes. JOB_MAX_CONCURRENCY caps how
+# many jobs call Ollama at once; submissions beyond JOB_MAX_PENDING are refused.
+JOB_MAX_CONCURRENCY = 2
+JOB_MAX_PENDING = 100
+JOB_RETENTION_SECONDS = 3600
+
+# Summaries: documents estimated above SUMMARY_SINGLE_SHOT_MAX_TOKENS are split
+# into ~SUMMARY_CHUNK_TOKENS sections, summarized in parallel and then merged.
+# Section summaries too long to merge are summarized again, at most
+# SUMMARY_MAX_MAP_LEVELS rounds in total, then trimmed to fit.
+SUMMARY_SINGLE_SHOT_MAX_TOKENS = 3000
+SUMMARY_CHUNK_TOKENS = 2500
+SUMMARY_MAP_CONCURRENCY = 4
+SUMMARY_MAX_MAP_LEVELS = 3
+
+# Persistent summary cache (SQLite). Bump SUMMARY_PROMPT_VERSION whenever the
+# summary prompts change so stale summaries are not served.
+SUMMARY_CACHE_PATH = "cache/summaries.sqlite3"
+SUMMARY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+SUMMARY_PROMPT_VERSION = 1
+
+# Quiz generation: the document is split into up to MCQ_MAX_SECTIONS sections of
+# at most MCQ_SECTION_CHARS characters, generated in parallel and deduplicated
+# when two questions' embeddings are at least MCQ_DEDUP_SIMILARITY alike.
+MCQ_SECTION_CHARS = 3500
+MCQ_MAX_SECTIONS = 8
+MCQ_SECTION_CONCURRENCY = 4
+MCQ_DEDUP_SIMILARITY = 0.9
+# Structured quiz generation: Ollama is given a JSON schema (`format`), each
+# question is validated as it streams in, and only invalid or duplicate ones
+# are requested again, for at most MCQ_REPAIR_ROUNDS extra rounds per section.
+MCQ_STRUCTURED_OUTPUT = True
+MCQ_REPAIR_ROUNDS = 2
+
+# Shared Ollama client: one pooled HTTP session per process, at most
+# OLLAMA_MAX_CONCURRENCY generations at once, retried with exponential backoff.
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_MAX_CONCURRENCY = 4
+OLLAMA_MAX_RETRIES = 2
+OLLAMA_RETRY_BACKOFF_SECONDS = 1.0
+
+# Upload text extraction runs on the in-memory upload stream. PDFs with at least
+# EXTRACT_PARALLEL_MIN_PAGES pages are split across a process pool.
+EXTRACT_MAX_BYTES = 50 * 1024 * 1024
+EXTRACT_MAX_PAGES = 1000
+EXTRACT_PARALLEL_MIN_PAGES = 40
+EXTRACT_PROCESS_WORKERS = 4
+
+# Extracted upload text, cached by the SHA-256 of the raw file bytes.
+EXTRACT_CACHE_PATH = "cache/extracted_text.sqlite3"
+EXTRACT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Shared embedding service: concurrent encode requests are merged for up to
+# EMBEDDING_BATCH_WINDOW_MS or EMBEDDING_MAX_BATCH_SIZE texts. Document
+# indexing is encoded in EMBEDDING_MAX_BATCH_SIZE slices behind those requests.
+EMBEDDING_MAX_BATCH_SIZE = 32
+EMBEDDING_BATCH_WINDOW_MS = 10
+
+# Load the embedding model and chatbot in a background thread right after
+# start-up. Set to False (or WARMUP_ON_START=0) for a lazy fast-start mode.
+WARMUP_ON_START = True
+
+# Batch grading: reference embeddings kept in memory, and the most answers
+# accepted by one /grade_answers request.
+GRADING_REFERENCE_CACHE_SIZE = 128
+GRADING_MAX_ANSWERS = 500
+
+# Hybrid retrieval: documents with at least LAZY_EMBED_MIN_CHUNKS chunks are
+# answered from BM25 while BACKGROUND_EMBED_WORKERS threads embed them. Each
+# ranking contributes TOP_K * HYBRID_CANDIDATE_MULTIPLIER candidates to fusion.
+LAZY_EMBED_MIN_CHUNKS = 200
+BACKGROUND_EMBED_WORKERS = 1
+HYBRID_CANDIDATE_MULTIPLIER = 4
+
+# Chatbot answer cache, scoped per document (RAG) or to normal chat. A new
+# question reuses an answer if its embedding is ANSWER_CACHE_SIMILARITY alike.
+ANSWER_CACHE_MAX_ENTRIES = 2000
+ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+ANSWER_CACHE_SIMILARITY = 0.95
+
+# Admin analytics: default and largest page for /get_analytics_all, and how
+# many quiz results each chunk of a streamed export holds.
+ANALYTICS_PAGE_SIZE = 100
+ANALYTICS_MAX_PAGE_SIZE = 1000
+ANALYTICS_EXPORT_BATCH_SIZE = 1000
+
+# MongoDB: requests fail after MONGO_SERVER_SELECTION_TIMEOUT_MS without a
+# reachable server. Start-up index creation runs in the background and is
+# retried every DB_SETUP_RETRY_SECONDS until Mongo answers.
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+DB_SETUP_RETRY_SECONDS = 30
+
+# Number of most recent quiz results kept in each student's analytics rollup
+# for the dashboard trend chart.
+ANALYTICS_TREND_POINTS = 200
+
+# Server-side sessions (Mongo). Reads are cached in-process for
+# SESSION_CACHE_SECONDS; unchanged sessions have their expiry pushed forward
+# at most once per SESSION_REFRESH_SECONDS.
+SESSION_COLLECTION = "sessions"
+SESSION_CACHE_SECONDS = 5
+SESSION_CACHE_MAX_ENTRIES = 1000
+SESSION_REFRESH_SECONDS = 300
+
+# Write-behind buffer for audit records: flushed as one bulk write per
+# BULK_WRITE_MAX_BATCH operations or BULK_WRITE_FLUSH_SECONDS. When the queue
+# is full, writers wait BULK_WRITE_ENQUEUE_TIMEOUT then write synchronously.
+# Failed writes are retried BULK_WRITE_MAX_RETRIES times, backing off from
+# BULK_WRITE_RETRY_BACKOFF seconds.
+BULK_WRITE_MAX_BATCH = 500
+BULK_WRITE_FLUSH_SECONDS = 0.5
+BULK_WRITE_MAX_QUEUE = 10000
+BULK_WRITE_ENQUEUE_TIMEOUT = 0.05
+BULK_WRITE_MAX_RETRIES = 3
+BULK_WRITE_RETRY_BACKOFF = 0.5
+
+# Requests slower than this are logged with their per-stage timing breakdown.
+SLOW_REQUEST_SECONDS = 2.0
+
+# Per-student knowledge bases (persistent user data, never evicted).
+KNOWLEDGE_BASE_DIRECTORY = "knowledge_bases"
+KB_MAX_DOCUMENTS = 200
+
+# Dense index type for document indexes: "flat" (exact), "hnsw", "ivfpq", or
+# "auto" to pick by chunk count. Flat up to ANN_FLAT_MAX_VECTORS, HNSW up to
+# ANN_HNSW_MAX_VECTORS, IVF-PQ beyond that (trained on up to ANN_TRAIN_SAMPLE
+# vectors, then re-ranking ANN_REFINE_K_FACTOR * k candidates on 8-bit
+# vectors). Knowledge bases always stay flat so documents can be removed.
+VECTOR_INDEX_TYPE = "auto"
+ANN_FLAT_MAX_VECTORS = 20000
+ANN_HNSW_MAX_VECTORS = 500000
+ANN_HNSW_M = 32
+ANN_HNSW_EF_CONSTRUCTION = 80
+ANN_HNSW_EF_SEARCH = 64
+ANN_IVF_NPROBE = 16
+ANN_PQ_SUBQUANTIZERS = 48
+ANN_TRAIN_SAMPLE = 100000
+ANN_REFINE_K_FACTOR = 4
@@ -1,24 +1,32 @@
 import logging
 import hashlib
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 
-from langchain_community.llms import Ollama
-from langchain_core.prompts import PromptTemplate
-
-from . import config
+from . import config, metrics
+from .sqlite_cache import SQLiteCache
 
 logger = logging.getLogger(__name__)
 
 _llm_instance = None
 _summary_chain = None
+_map_chain = None
+_reduce_chain = None
+_summary_cache = None
 
 def _get_llm():
     """Get or create a shared LLM instance."""
     global _llm_instance
     if _llm_instance is None:
-        _llm_instance = Ollama(model=config.PROCESSING_MODEL_ID, temperature=0.3)
+        from .langchain_adapters import PooledOllama
+        _llm_instance = PooledOllama(model=config.PROCESSING_MODEL_ID, temperature=0.3, num_ctx=4096)
     return _llm_instance
 
+def _make_chain(prompt_template: str):
+    """Build an LCEL chain (prompt | llm); LangChain is imported on first use."""
+    from langchain_core.prompts import PromptTemplate
+    return PromptTemplate.from_template(prompt_template) | _get_llm()
+
 def _get_summary_chain():
     """Create modern LCEL chain (prompt | llm)."""
     global _summary_chain
@@ -32,30 +40,128 @@ def _get_summary_chain():
 
         BULLET POINT SUMMARY:
         """
-        PROMPT = PromptTemplate.from_template(prompt_template)
-
-        _summary_chain = PROMPT | _get_llm()
+        _summary_chain = _make_chain(prompt_template)
 
     return _summary_chain
 
-@lru_cache(maxsize=50)
-def _get_cached_summary(text_hash: str, full_text: str) -> str:
-    """Cache summaries based on text hash."""
-    logger.info("Generating bullet-point summary with Ollama.")
-    try:
-        chain = _get_summary_chain()
+def _get_map_chain():
+    """Chain that summarizes one section of a long document."""
+    global _map_chain
+    if _map_chain is None:
+        prompt_template = """
+        You are an expert academic assistant. The following text is one section of a longer document.
+        Summarize the key points of this section as bullet points, each beginning with '*'.
 
-        result = chain.invoke({"document": full_text})
-        return result.strip()
+        SECTION:
+        {document}
 
-    except Exception as e:
-        logger.error("Error during summary generation", exc_info=True)
-        return "Error: An issue occurred while generating the summary. Is the Ollama app running?"
+        BULLET POINT SUMMARY:
+        """
+        _map_chain = _make_chain(prompt_template)
+
+    return _map_chain
+
+def _get_reduce_chain():
+    """Chain that merges section summaries into one final summary."""
+    global _reduce_chain
+    if _reduce_chain is None:
+        prompt_template = """
+        You are an expert academic assistant. Below are bullet-point summaries of consecutive sections of one document.
+        Merge them into a single high-quality, concise summary of the whole document, removing repetition.
+        Generate the summary as bullet points, each beginning with '*'.
+
+        SECTION SUMMARIES:
+        {document}
+
+        BULLET POINT SUMMARY:
+        """
+        _reduce_chain = _make_chain(prompt_template)
+
+    return _reduce_chain
+
+def _estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4
+
+def _split_for_map(full_text: str) -> List[str]:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    chunk_chars = config.SUMMARY_CHUNK_TOKENS * 4
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_chars, chunk_overlap=chunk_chars // 20)
+    return splitter.split_text(full_text)
+
+def _fit_partials(partials: List[str], max_tokens: int) -> str:
+    """Trim every section summary by the same share so the merge prompt fits and keeps the whole document."""
+    budget = max(1, max_tokens * 4 // len(partials))
+    return "\n".join(p[:budget] for p in partials)
+
+def _summarize_text(full_text: str, level: int = 1) -> str:
+    """Summarize in one prompt if the text fits, otherwise map-reduce over sections.
+
+    Section summaries that are still too long to merge are summarized again,
+    up to SUMMARY_MAX_MAP_LEVELS map rounds; after that they are trimmed to fit.
+    """
+    if _estimate_tokens(full_text) <= config.SUMMARY_SINGLE_SHOT_MAX_TOKENS:
+        return _get_summary_chain().invoke({"document": full_text}).strip()
+
+    sections = _split_for_map(full_text)
+    logger.info(f"Map-reduce summary over {len(sections)} sections.")
+
+    map_chain = _get_map_chain()
+    def summarize_section(section):
+        with metrics.stage("summary.map_section"):
+            return map_chain.invoke({"document": section}).strip()
+
+    with metrics.stage("summary.map"), ThreadPoolExecutor(max_workers=config.SUMMARY_MAP_CONCURRENCY) as pool:
+        partials = list(pool.map(summarize_section, sections))
+
+    combined = "\n".join(partials)
+    if _estimate_tokens(combined) > config.SUMMARY_SINGLE_SHOT_MAX_TOKENS:
+        if level < config.SUMMARY_MAX_MAP_LEVELS:
+            # Still too long to merge in one prompt: summarize the summaries.
+            return _summarize_text(combined, level + 1)
+        logger.warning(f"Section summaries still too long after {level} map rounds; trimming them to fit.")
+        combined = _fit_partials(partials, config.SUMMARY_SINGLE_SHOT_MAX_TOKENS)
+
+    with metrics.stage("summary.reduce"):
+        return _get_reduce_chain().invoke({"document": combined}).strip()
+
+def _get_summary_cache() -> SQLiteCache:
+    """Get or create the persistent summary cache shared by all workers."""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = SQLiteCache(config.SUMMARY_CACHE_PATH, config.SUMMARY_CACHE_MAX_BYTES, table="summaries")
+    return _summary_cache
+
+def summary_cache_stats() -> Dict[str, float]:
+    """Hit/miss counts and hit rate of the summary cache in this process."""
+    return _get_summary_cache().stats()
+
+def _summary_cache_key(text_hash: str) -> str:
+    """Key summaries by content plus the model and prompt version that produced them."""
+    return f"{config.PROCESSING_MODEL_ID}:v{config.SUMMARY_PROMPT_VERSION}:{text_hash}"
 
 def generate_bullet_point_summary(full_text: str) -> str:
     """Generate a bullet-point summary with caching."""
     if not full_text.strip():
         return "Error: Cannot summarize empty text."
 
-    text_hash = hashlib.md5(full_text.encode()).hexdigest()
-    return _get_cached_summary(text_hash, full_text)
\ No newline at end of file
+    text_hash = hashlib.sha256(full_text.encode()).hexdigest()
+    cache_key = _summary_cache_key(text_hash)
+
+    with metrics.stage("summary.cache_lookup"):
+        cached = _get_summary_cache().get(cache_key)
+    if cached is not None:
+        return cached
+
+    logger.info("Generating bullet-point summary with Ollama.")
+    try:
+        with metrics.stage("summary.generate"):
+            summary = _summarize_text(full_text)
+    except Exception as e:
+        # Failures are not cached, so the next request tries again.
+        logger.error("Error during summary generation", exc_info=True)
+        return "Error: An issue occurred while generating the summary. Is the Ollama app running?"
+
+    if summary:
+        _get_summary_cache().set(cache_key, summary)
+    return summary
\ No newline at end of file
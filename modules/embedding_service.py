@@ -0,0 +1,212 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+# Queue priorities: interactive requests (a question, a grading call) are
+# always encoded before queued slices of bulk work (indexing a document).
+_INTERACTIVE = 0
+_BULK = 1
+
+
+class _Pending:
+    """One encode() call, possibly split into several slices."""
+
+    def __init__(self, num_slices: int):
+        self.future: Future = Future()
+        self.vectors: List[Optional[np.ndarray]] = [None] * num_slices
+        self.remaining = num_slices
+        self._lock = threading.Lock()
+
+    def set_slice(self, index: int, vectors: np.ndarray):
+        with self._lock:
+            if self.future.done():
+                return
+            self.vectors[index] = vectors
+            self.remaining -= 1
+            done = self.remaining == 0
+        if done:
+            self.future.set_result(np.concatenate(self.vectors) if len(self.vectors) > 1 else self.vectors[0])
+
+    def set_exception(self, error: Exception):
+        with self._lock:
+            if self.future.done():
+                return
+            self.future.set_exception(error)
+
+
+class EmbeddingService:
+    """The one embedding model in the process, shared by grading, quizzes and RAG.
+
+    `encode()` calls from different threads are queued and a single worker
+    thread merges them into one batch: it waits up to `batch_window_ms` after
+    the first request for more to arrive, up to `max_batch_size` texts. Under
+    load this turns many small encodes into a few large, CPU-efficient ones.
+
+    Requests larger than `max_batch_size` texts are cut into slices of that
+    size. Priority comes only from the caller: `bulk=True` (document
+    indexing, via ServiceEmbeddings.embed_documents) queues slices behind
+    interactive requests, however large those are, so a question or a
+    grading call never waits for more than one slice of a document's
+    embedding. `busy()` tells whether bulk work is outstanding.
+
+    On CPU the model can be dynamically quantized to int8 (`quantize`) and
+    torch's thread count pinned (`threads`); see config.EMBEDDING_PROFILES.
+    """
+
+    def __init__(self, model_id: str, device: str, max_batch_size: int, batch_window_ms: float,
+                 quantize: bool = False, threads: Optional[int] = None):
+        import torch
+        from sentence_transformers import SentenceTransformer  # deferred: pulls in torch
+
+        if threads:
+            torch.set_num_threads(threads)
+
+        self.model = SentenceTransformer(model_id, device=device)
+        self.model.eval()
+        if quantize:
+            if device == "cpu":
+                torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            else:
+                logger.warning(f"int8 quantization is CPU-only; running '{model_id}' unquantized on {device}.")
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+
+        # (priority, sequence, texts, pending, slice index)
+        self._requests: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._bulk_slices = 0
+        self._bulk_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, texts: List[str], bulk: bool = False) -> np.ndarray:
+        """Return L2-normalized embeddings, one row per text. `bulk` queues them behind interactive requests."""
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        texts = list(texts)
+        slices = [texts[i:i + self.max_batch_size] for i in range(0, len(texts), self.max_batch_size)]
+        pending = _Pending(len(slices))
+
+        priority = _BULK if bulk else _INTERACTIVE
+        if bulk:
+            with self._bulk_lock:
+                self._bulk_slices += len(slices)
+        for index, chunk in enumerate(slices):
+            self._requests.put((priority, next(self._sequence), chunk, pending, index))
+        return pending.future.result()
+
+    def busy(self) -> bool:
+        """True while bulk (document indexing) work is queued or being encoded."""
+        with self._bulk_lock:
+            return self._bulk_slices > 0
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            count = len(batch[0][2])
+            deadline = time.monotonic() + self.batch_window
+
+            while count < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if count + len(item[2]) > self.max_batch_size:
+                    # Keep its place in line for the next batch.
+                    self._requests.put(item)
+                    break
+                batch.append(item)
+                count += len(item[2])
+
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        import torch
+
+        texts = [text for _, _, item_texts, _, _ in batch for text in item_texts]
+        try:
+            with torch.no_grad():
+                vectors = self.model.encode(
+                    texts,
+                    batch_size=self.max_batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                )
+        except Exception as e:
+            vectors = None
+            error = e
+
+        bulk_done = 0
+        offset = 0
+        for priority, _, item_texts, pending, index in batch:
+            if vectors is None:
+                pending.set_exception(error)
+            else:
+                pending.set_slice(index, vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+            bulk_done += priority == _BULK
+        if bulk_done:
+            with self._bulk_lock:
+                self._bulk_slices -= bulk_done
+
+
+_service: Optional[EmbeddingService] = None
+_service_failed = False
+_service_lock = threading.Lock()
+
+
+def active_profile() -> Dict[str, Any]:
+    """The embedding profile selected by config.EMBEDDING_PROFILE."""
+    return config.EMBEDDING_PROFILES[config.EMBEDDING_PROFILE]
+
+
+def embedding_signature() -> str:
+    """Identifies the vectors the active profile produces, for cache keys."""
+    profile = active_profile()
+    return profile["model_id"] + ("|int8" if profile["quantize"] else "")
+
+
+def get_embedding_service() -> Optional[EmbeddingService]:
+    """Get or load the process-wide embedding service. Returns None if the model failed to load."""
+    global _service, _service_failed
+    with _service_lock:
+        if _service is None and not _service_failed:
+            import torch
+            device = getattr(config, 'DEVICE', None) or ('cuda' if torch.cuda.is_available() else 'cpu')
+            profile = active_profile()
+            try:
+                _service = EmbeddingService(
+                    profile["model_id"],
+                    device=device,
+                    max_batch_size=config.EMBEDDING_MAX_BATCH_SIZE,
+                    batch_window_ms=config.EMBEDDING_BATCH_WINDOW_MS,
+                    quantize=profile["quantize"],
+                    threads=profile["threads"],
+                )
+                logger.info(f"Embedding profile '{config.EMBEDDING_PROFILE}' ({profile['model_id']}) loaded on {device}.")
+            except Exception:
+                logger.exception("Failed to load embedding model.")
+                _service_failed = True
+        return _service
+
+
+def embedding_service_status() -> str:
+    """'loaded', 'failed' or 'not_loaded', without triggering a load."""
+    if _service is not None:
+        return "loaded"
+    return "failed" if _service_failed else "not_loaded"
@@ -1,21 +1,43 @@
-import logging, torch
-from typing import Tuple, Optional
-from sentence_transformers import SentenceTransformer, util
+import hashlib, threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple
 from . import config
-_embedding = None
-try:
-    device = getattr(config, 'DEVICE', None) or ('cuda' if torch.cuda.is_available() else 'cpu')
-    _embedding = SentenceTransformer(config.EMBEDDING_MODEL_ID, device=device); _embedding.eval()
-    logging.info("Embedding loaded")
-except Exception:
-    logging.exception("emb load fail"); _embedding = None
+from .embedding_service import get_embedding_service, embedding_signature
 
-def evaluate_student_answer(student_answer: str, reference_summary: str) -> Tuple[float,str]:
-    if not _embedding: return 0.0, "Error: grading model unavailable."
-    if not student_answer.strip(): return 0.0, "Warning: answer empty."
-    with torch.no_grad():
-        emb = _embedding.encode([student_answer, reference_summary], convert_to_tensor=True, show_progress_bar=False, normalize_embeddings=True)
-        sim = util.pytorch_cos_sim(emb[0].unsqueeze(0), emb[1].unsqueeze(0)).item()
-    score = round(max(0,sim)*10,1)
+_reference_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_reference_lock = threading.Lock()
+
+def _feedback(score: float) -> str:
     fb = ("Excellent" if score>8.5 else "Good" if score>6.5 else "Fair" if score>4.0 else "Needs improvement")
-    return score, f"{fb}. (Score: {score})"
\ No newline at end of file
+    return f"{fb}. (Score: {score})"
+
+def _reference_embedding(embedding, reference_summary: str) -> np.ndarray:
+    """Embed a reference once and reuse it, keyed by its hash and the embedding profile."""
+    key = hashlib.sha256(f"{embedding_signature()}|{reference_summary}".encode("utf-8")).hexdigest()
+    with _reference_lock:
+        if key in _reference_cache:
+            _reference_cache.move_to_end(key)
+            return _reference_cache[key]
+    vec = embedding.encode([reference_summary])[0]
+    with _reference_lock:
+        _reference_cache[key] = vec
+        while len(_reference_cache) > config.GRADING_REFERENCE_CACHE_SIZE: _reference_cache.popitem(last=False)
+    return vec
+
+def evaluate_student_answers(student_answers: List[str], reference_summary: str) -> List[Tuple[float,str]]:
+    """Grade many answers against one reference: one reference embedding, one batched encode, one matrix product."""
+    embedding = get_embedding_service()
+    if not embedding: return [(0.0, "Error: grading model unavailable.")] * len(student_answers)
+    results: List[Tuple[float,str]] = [(0.0, "Warning: answer empty.")] * len(student_answers)
+    idx = [i for i, a in enumerate(student_answers) if a and a.strip()]
+    if not idx: return results
+    ref = _reference_embedding(embedding, reference_summary)
+    sims = embedding.encode([student_answers[i] for i in idx]) @ ref
+    for i, sim in zip(idx, sims):
+        score = round(max(0.0, float(sim))*10,1)
+        results[i] = (score, _feedback(score))
+    return results
+
+def evaluate_student_answer(student_answer: str, reference_summary: str) -> Tuple[float,str]:
+    return evaluate_student_answers([student_answer], reference_summary)[0]
\ No newline at end of file
@@ -0,0 +1,80 @@
+import logging
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .lexical_index import BM25Index
+from .vector_index import index_nbytes
+
+logger = logging.getLogger(__name__)
+
+# Standard reciprocal rank fusion constant; dampens the weight of top ranks.
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]]) -> List[int]:
+    """Merge several best-first rankings of chunk indices into one."""
+    scores = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            scores[idx] = scores.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridIndex:
+    """Retrieval over one document's chunks: BM25 immediately, dense when ready.
+
+    The lexical index is built synchronously and can answer questions at once.
+    The FAISS store may be attached later (`attach_dense`) by a background
+    embedding job; from then on lexical and dense rankings are fused with
+    reciprocal rank fusion. Dense positions are chunk indices, because
+    `build_vector_store` adds vectors in chunk order.
+    """
+
+    def __init__(self, chunks: List[str], embedding, dense=None):
+        self.chunks = chunks
+        self.embedding = embedding
+        self.lexical = BM25Index(chunks)
+        self.dense = dense
+
+    @classmethod
+    def from_vector_store(cls, vector_store, embedding) -> "HybridIndex":
+        """Rebuild the chunk list (and BM25) from a FAISS store loaded from disk."""
+        ids = vector_store.index_to_docstore_id
+        chunks = [vector_store.docstore.search(ids[i]).page_content for i in range(len(ids))]
+        return cls(chunks, embedding, dense=vector_store)
+
+    @property
+    def dense_ready(self) -> bool:
+        return self.dense is not None
+
+    def attach_dense(self, vector_store):
+        self.dense = vector_store
+
+    def _dense_ranking(self, query: str, n: int) -> List[int]:
+        vector = np.array([self.embedding.embed_query(query)], dtype=np.float32)
+        _, positions = self.dense.index.search(vector, n)
+        return [int(i) for i in positions[0] if i >= 0]
+
+    def search(self, query: str, k: int, candidates: int) -> List[Document]:
+        rankings = [[idx for idx, _ in self.lexical.search(query, candidates)]]
+        dense = self.dense
+        if dense is not None:
+            try:
+                rankings.append(self._dense_ranking(query, candidates))
+            except Exception as e:
+                logger.warning(f"Dense retrieval failed, using lexical results only: {e}")
+
+        return [
+            Document(page_content=self.chunks[idx], metadata={"chunk": idx})
+            for idx in reciprocal_rank_fusion(rankings)[:k]
+        ]
+
+    def nbytes(self) -> int:
+        """Rough memory footprint: chunk text, postings and dense vectors."""
+        text_bytes = sum(len(c.encode("utf-8")) for c in self.chunks)
+        lexical_bytes = self.lexical.num_postings * 16
+        dense = self.dense
+        dense_bytes = index_nbytes(dense.index) if dense is not None else 0
+        return text_bytes + lexical_bytes + dense_bytes
@@ -0,0 +1,114 @@
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import Optional
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+# Memory-map flat vector codes when faiss supports it, so loading a large index
+# does not copy it into RAM and pages are shared between workers.
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+class DiskIndexStore:
+    """Content-addressed on-disk cache of FAISS vector stores.
+
+    Each entry is a directory named by its key, written with `FAISS.save_local`.
+    Entries are written to a temporary directory and renamed into place, so
+    several workers can share one cache directory safely. Directory mtimes
+    track recency and the least recently used entries are removed once the
+    cache grows past `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def load(self, key: str, embeddings) -> Optional[FAISS]:
+        """Load a stored index, memory-mapped where possible. Returns None on a miss."""
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+
+        try:
+            try:
+                store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True, io_flags=_MMAP_FLAGS)
+            except RuntimeError:
+                # Index types without mmap support are read into memory instead.
+                store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+            os.utime(path)
+            logger.info(f"Loaded vector store {key} from disk cache.")
+            return store
+        except Exception as e:
+            logger.warning(f"Discarding unreadable index cache entry {key}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+    def save(self, key: str, vector_store: FAISS):
+        """Persist an index under `key` and enforce the size budget.
+
+        Raises OSError if the entry could not be written (e.g. the disk is full).
+        """
+        path = self._path(key)
+        if os.path.isdir(path):
+            os.utime(path)
+            return
+
+        tmp_path = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            vector_store.save_local(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if os.path.isdir(path):
+                # Another worker saved the same document first (ENOTEMPTY/EEXIST).
+                return
+            logger.error(f"Failed to write index cache entry {key}: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to write index cache entry {key}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                path = self._path(name)
+                if name.startswith(".tmp-") or not os.path.isdir(path):
+                    continue
+                size = _dir_size(path)
+                entries.append((os.path.getmtime(path), size, path))
+                total += size
+
+            entries.sort()
+            # Never evict the most recently written entry.
+            for _, size, path in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                logger.info(f"Evicted {os.path.basename(path)} from index cache.")
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
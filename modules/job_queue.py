@@ -0,0 +1,114 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+
+class JobQueue:
+    """Runs slow LLM tasks (summaries, quizzes) on a small bounded worker pool.
+
+    Submitting returns a job id immediately; clients poll `get()` for the
+    result. The pool size caps how many jobs talk to Ollama at once. Job status
+    is mirrored into an optional Mongo collection so any worker process can
+    answer a status query, and finished jobs are dropped from memory after
+    `retention_seconds` (the store expires them with a TTL index on
+    `finished_at`, see analytics.INDEXES).
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, store=None, retention_seconds: int = 3600):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._store = store
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, owner: str, func: Callable, *args, **kwargs) -> str:
+        """Queue `func(*args, **kwargs)` and return the new job id."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs are already queued.")
+            self._pending += 1
+            self._prune()
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "kind": kind,
+                "owner": owner,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "created_at": datetime.utcnow(),
+                "finished_at": None,
+            }
+            self._jobs[job_id] = job
+
+        self._persist(job)
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, func: Callable, args, kwargs):
+        self._update(job_id, status="running")
+        try:
+            result = func(*args, **kwargs)
+            self._update(job_id, status="done", result=result, finished_at=datetime.utcnow())
+        except Exception as e:
+            logger.error(f"Job {job_id} failed", exc_info=True)
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            snapshot = dict(job)
+        self._persist(snapshot)
+
+    def _persist(self, job: Dict[str, Any]):
+        if self._store is None:
+            return
+        try:
+            doc = {k: v for k, v in job.items() if k != "job_id"}
+            self._store.update_one({"_id": job["job_id"]}, {"$set": doc}, upsert=True)
+        except Exception as e:
+            logger.warning(f"Could not persist status of job {job['job_id']}: {e}")
+
+    def _prune(self):
+        """Forget finished jobs past their retention window. Caller holds the lock."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's status document, from memory or the shared store."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+
+        if self._store is None:
+            return None
+        doc = self._store.find_one({"_id": job_id})
+        if doc is None:
+            return None
+        doc["job_id"] = doc.pop("_id")
+        return doc
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from .hybrid_index import reciprocal_rank_fusion
+from .lexical_index import BM25Index
+from .vector_index import index_nbytes
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+# Knowledge bases saved before CURRENT existed keep their files at the top level.
+_LEGACY_VERSION = "legacy"
+
+
+class KnowledgeBaseError(Exception):
+    """A saved knowledge base exists but could not be read."""
+
+
+def document_id(text: str) -> str:
+    """Content-derived document id, so re-adding the same text is a no-op."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class KnowledgeBase:
+    """One student's searchable collection of documents.
+
+    Documents are added and removed incrementally: adding embeds only the new
+    chunks and appends them to the FAISS index (`add_embeddings`); removing
+    deletes that document's vectors and postings. Nothing else is re-embedded.
+    Retrieval fuses BM25 and dense rankings like HybridIndex, and can be
+    restricted to a subset of documents.
+
+    Chunk ids are "<doc_id>:<n>" and double as FAISS docstore ids. The dense
+    index stays flat: removal relies on `remove_ids` renumbering positions,
+    which HNSW does not support and IVF does not do.
+    """
+
+    def __init__(self, embedding, dense: Optional[FAISS] = None, documents: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.embedding = embedding
+        self.dense = dense
+        self.documents: Dict[str, Dict[str, Any]] = documents or {}
+        self.chunks: Dict[str, str] = {}
+        self.lexical = BM25Index()
+        # Bumped on every change; part of the answer-cache scope.
+        self.version = 0
+        # Saved version this instance matches ("" if never saved/loaded).
+        self.disk_version = ""
+        self._lock = threading.RLock()
+
+        if dense is not None:
+            for docstore_id in dense.index_to_docstore_id.values():
+                text = dense.docstore.search(docstore_id).page_content
+                self.chunks[docstore_id] = text
+                self.lexical.add(docstore_id, text)
+
+    def add_document(self, doc_id: str, filename: str, chunks: List[str],
+                     vectors: Optional[List[List[float]]] = None) -> bool:
+        """Index a new document, embedding it unless `vectors` are given. Returns False if it was already present."""
+        with self._lock:
+            if doc_id in self.documents:
+                return False
+
+        if vectors is None:
+            vectors = self.embedding.embed_documents(chunks)
+        chunk_ids = [f"{doc_id}:{i}" for i in range(len(chunks))]
+        metadatas = [{"doc_id": doc_id, "filename": filename, "chunk": i} for i in range(len(chunks))]
+
+        with self._lock:
+            if doc_id in self.documents:
+                return False
+            pairs = list(zip(chunks, vectors))
+            if self.dense is None:
+                self.dense = FAISS.from_embeddings(pairs, self.embedding, metadatas=metadatas, ids=chunk_ids)
+            else:
+                self.dense.add_embeddings(pairs, metadatas=metadatas, ids=chunk_ids)
+
+            for chunk_id, text in zip(chunk_ids, chunks):
+                self.chunks[chunk_id] = text
+                self.lexical.add(chunk_id, text)
+            self.documents[doc_id] = {
+                "doc_id": doc_id,
+                "filename": filename,
+                "chunk_ids": chunk_ids,
+                "added_at": time.time(),
+            }
+            self.version += 1
+        return True
+
+    def remove_document(self, doc_id: str) -> bool:
+        with self._lock:
+            document = self.documents.pop(doc_id, None)
+            if document is None:
+                return False
+            chunk_ids = document["chunk_ids"]
+            if self.dense is not None:
+                self.dense.delete(chunk_ids)
+            for chunk_id in chunk_ids:
+                self.lexical.remove(chunk_id, self.chunks.pop(chunk_id, None))
+            self.version += 1
+        return True
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"doc_id": d["doc_id"], "filename": d["filename"], "chunks": len(d["chunk_ids"]), "added_at": d["added_at"]}
+                for d in sorted(self.documents.values(), key=lambda d: d["added_at"])
+            ]
+
+    def _dense_ranking(self, query: str, n: int, allowed: Optional[set]) -> List[str]:
+        vector = np.array([self.embedding.embed_query(query)], dtype=np.float32)
+        ids = self.dense.index_to_docstore_id
+        if allowed is None:
+            _, positions = self.dense.index.search(vector, n)
+        else:
+            selected = np.array([pos for pos, cid in ids.items() if cid in allowed], dtype=np.int64)
+            if not len(selected):
+                return []
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(selected))
+            _, positions = self.dense.index.search(vector, min(n, len(selected)), params=params)
+        return [ids[int(p)] for p in positions[0] if p >= 0]
+
+    def search(self, query: str, k: int, candidates: int, doc_ids: Optional[List[str]] = None) -> List[Document]:
+        """Top-k chunks for `query`, optionally only from the documents in `doc_ids`."""
+        with self._lock:
+            allowed = None
+            if doc_ids:
+                allowed = {cid for d in doc_ids if d in self.documents for cid in self.documents[d]["chunk_ids"]}
+
+            rankings = [[cid for cid, _ in self.lexical.search(query, candidates, allowed=allowed)]]
+            if self.dense is not None and self.dense.index.ntotal:
+                try:
+                    rankings.append(self._dense_ranking(query, candidates, allowed))
+                except Exception as e:
+                    logger.warning(f"Dense retrieval failed, using lexical results only: {e}")
+
+            results = []
+            for chunk_id in reciprocal_rank_fusion(rankings)[:k]:
+                doc_id, chunk = chunk_id.rsplit(":", 1)
+                results.append(Document(
+                    page_content=self.chunks[chunk_id],
+                    metadata={"doc_id": doc_id, "filename": self.documents[doc_id]["filename"], "chunk": int(chunk)}
+                ))
+            return results
+
+    def nbytes(self) -> int:
+        with self._lock:
+            text_bytes = sum(len(c.encode("utf-8")) for c in self.chunks.values())
+            dense_bytes = index_nbytes(self.dense.index) if self.dense is not None else 0
+            return text_bytes + self.lexical.num_postings * 16 + dense_bytes
+
+
+class KnowledgeBaseStore:
+    """Persists knowledge bases under `root`, one directory per student.
+
+    Unlike the index cache these are user data, so nothing is ever evicted.
+    Each save writes the FAISS store plus a document manifest to a new
+    version subdirectory, then atomically replaces the CURRENT file naming
+    it, so readers always find a complete copy. A reader whose version is
+    replaced (and cleaned up) mid-load simply reads the new one.
+
+    Several workers may change the same knowledge base. Callers hold
+    `locked(student)` (an OS file lock) around reload -> change -> save, so
+    one worker's save never overwrites a document another worker just added.
+    A knowledge base that exists but cannot be read raises
+    KnowledgeBaseError rather than loading empty, so it is never saved over.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, student: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(student.encode("utf-8")).hexdigest()[:32])
+
+    @contextmanager
+    def locked(self, student: str):
+        """Exclusive, cross-process lock on one student's knowledge base."""
+        with open(self._path(student) + ".lock", "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def version(self, student: str) -> str:
+        """The student's current saved version (by any worker), or "" if none was ever saved."""
+        path = self._path(student)
+        try:
+            with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return _LEGACY_VERSION if os.path.isfile(os.path.join(path, MANIFEST_FILE)) else ""
+
+    def _version_path(self, student: str, version: str) -> str:
+        path = self._path(student)
+        return path if version == _LEGACY_VERSION else os.path.join(path, version)
+
+    def load(self, student: str, embedding, attempts: int = 3) -> KnowledgeBase:
+        """Load a student's knowledge base, or return an empty one if none was saved.
+
+        Raises KnowledgeBaseError if the saved copy cannot be read.
+        """
+        for _ in range(attempts):
+            version = self.version(student)
+            if not version:
+                return KnowledgeBase(embedding)
+            path = self._version_path(student, version)
+            try:
+                with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+                    documents = json.load(f)
+                dense = None
+                if documents:
+                    dense = FAISS.load_local(path, embedding, allow_dangerous_deserialization=True)
+                kb = KnowledgeBase(embedding, dense=dense, documents=documents)
+                kb.disk_version = version
+                return kb
+            except Exception as e:
+                if self.version(student) != version:
+                    continue  # Replaced by another worker's save while we read it.
+                raise KnowledgeBaseError(f"Could not load knowledge base at {path}: {e}") from e
+        raise KnowledgeBaseError(f"Knowledge base at {self._path(student)} kept changing while loading.")
+
+    def save(self, student: str, kb: KnowledgeBase):
+        path = self._path(student)
+        version = uuid.uuid4().hex
+        version_path = os.path.join(path, version)
+
+        with kb._lock:
+            os.makedirs(version_path)
+            if kb.documents and kb.dense is not None:
+                kb.dense.save_local(version_path)
+            with open(os.path.join(version_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(kb.documents, f)
+
+        with self._lock:
+            pointer = os.path.join(path, f".{CURRENT_FILE}-{version}")
+            with open(pointer, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(pointer, os.path.join(path, CURRENT_FILE))
+
+            # Older versions (and a legacy top-level copy) are no longer referenced.
+            for name in os.listdir(path):
+                if name not in (CURRENT_FILE, version):
+                    old = os.path.join(path, name)
+                    if os.path.isdir(old):
+                        shutil.rmtree(old, ignore_errors=True)
+                    else:
+                        os.remove(old)
+        kb.disk_version = version
@@ -0,0 +1,58 @@
+"""
+LangChain adapters over the app's shared services, for use in LCEL chains.
+Kept separate so importing the services themselves stays cheap.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+from .embedding_service import EmbeddingService, get_embedding_service
+from .ollama_client import get_client
+
+
+class PooledOllama(LLM):
+    """LangChain LLM backed by the shared `OllamaClient`, for use in LCEL chains."""
+
+    model: str
+    temperature: float = 0.8
+    num_ctx: int = 2048
+    timeout: float = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-ollama"
+
+    @property
+    def _options(self) -> Dict[str, Any]:
+        return {"temperature": self.temperature, "num_ctx": self.num_ctx}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        options = dict(self._options, stop=stop) if stop else self._options
+        return get_client().generate(prompt, self.model, options, timeout=self.timeout)
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        options = dict(self._options, stop=stop) if stop else self._options
+        for token in get_client().stream(prompt, self.model, options, timeout=self.timeout):
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class ServiceEmbeddings(Embeddings):
+    """LangChain `Embeddings` adapter over the shared `EmbeddingService`."""
+
+    def _service(self) -> EmbeddingService:
+        service = get_embedding_service()
+        if service is None:
+            raise RuntimeError("Embedding model is unavailable.")
+        return service
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Document chunks: queued behind interactive encodes.
+        return self._service().encode(texts, bulk=True).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._service().encode([text])[0].tolist()
@@ -0,0 +1,78 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Collection, Dict, Hashable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """An in-memory Okapi BM25 inverted index over a list of text chunks.
+
+    Building it is a single tokenizing pass, so it is ready long before the
+    chunks could be embedded. Chunks passed to the constructor get ids
+    0..n-1; `add` and `remove` update the index in place under any hashable
+    id, touching only the postings of that chunk's terms. IDF is computed at
+    query time, so it always reflects the current set of chunks.
+    """
+
+    def __init__(self, chunks: List[str] = (), k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.total_length = 0
+        self.num_postings = 0
+
+        for idx, chunk in enumerate(chunks):
+            self.add(idx, chunk)
+
+    def add(self, chunk_id: Hashable, text: str):
+        if chunk_id in self.doc_lengths:
+            self.remove(chunk_id)
+        counts = Counter(tokenize(text))
+        length = sum(counts.values())
+        self.doc_lengths[chunk_id] = length
+        self.total_length += length
+        for term, tf in counts.items():
+            self.postings[term][chunk_id] = tf
+        self.num_postings += len(counts)
+
+    def remove(self, chunk_id: Hashable, text: Optional[str] = None):
+        """Drop a chunk. Pass its text to avoid scanning every term's postings."""
+        length = self.doc_lengths.pop(chunk_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        terms = set(tokenize(text)) if text is not None else list(self.postings)
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None and docs.pop(chunk_id, None) is not None:
+                self.num_postings -= 1
+                if not docs:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int, allowed: Optional[Collection[Hashable]] = None) -> List[Tuple[Hashable, float]]:
+        """Return up to `k` (chunk id, score) pairs, best first, optionally only from `allowed` ids."""
+        n = len(self.doc_lengths)
+        if not n:
+            return []
+        avg_length = (self.total_length / n) or 1.0
+
+        scores: Dict[Hashable, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for idx, tf in docs.items():
+                if allowed is not None and idx not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[idx] / avg_length)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -1,18 +1,20 @@
 import logging
+import math
+import queue
 import re
 import hashlib
 import json
-import requests
-from typing import List, Dict, Any
-from . import config
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+from . import config, metrics
+from .ollama_client import OllamaError, get_client
 
 logger = logging.getLogger(__name__)
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
-
 def _generate_raw_text_direct(full_text: str, num_questions: int) -> str:
     """
-    Connects directly to Ollama without LangChain.
+    Connects directly to Ollama (through the shared client) without LangChain.
     """
     prompt = f"""
     You are a quiz generator. Create exactly {num_questions} multiple-choice questions based on the text below.
@@ -34,40 +36,25 @@ def _generate_raw_text_direct(full_text: str, num_questions: int) -> str:
     ###
 
     TEXT TO QUIZ:
-    "{full_text[:3500]}"  
+    "{full_text[:config.MCQ_SECTION_CHARS]}"  
     """
 
     model_to_use = getattr(config, 'CHATBOT_MODEL_ID', 'llama3.2')
     
-    payload = {
-        "model": model_to_use,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": 0.1,
-            "num_ctx": 4096
-        }
+    options = {
+        "temperature": 0.1,
+        "num_ctx": 4096
     }
 
     logger.info(f"Sending request to Ollama ({model_to_use})...")
-    print(f"--- DEBUG: Contacting Ollama at {OLLAMA_URL} with model {model_to_use} ---")
 
     try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=120)
-        
-        if response.status_code == 200:
-            response_json = response.json()
-            raw_response = response_json.get("response", "")
-            print("--- DEBUG: Received response from Ollama ---")
-            return raw_response
-        else:
-            logger.error(f"Ollama API Error: {response.status_code} - {response.text}")
-            print(f"--- ERROR: Ollama API returned status {response.status_code} ---")
-            return ""
+        raw_response = get_client().generate(prompt, model_to_use, options, timeout=120)
+        logger.debug("Received response from Ollama.")
+        return raw_response
             
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to connect to Ollama: {e}")
-        print(f"--- DEBUG ERROR: Could not connect to Ollama. Is it running? {e} ---")
+    except OllamaError as e:
+        logger.error(f"Could not get a response from Ollama. Is it running? {e}")
         return ""
 
 def _scavenge_mcqs_from_text(raw_text: str) -> List[Dict[str, Any]]:
@@ -108,29 +95,423 @@ def _scavenge_mcqs_from_text(raw_text: str) -> List[Dict[str, Any]]:
 
     return mcqs
 
+def _partition_sections(full_text: str) -> List[str]:
+    """
+    Splits the text into evenly spaced sections that fit one prompt each.
+    Very long documents get at most MCQ_MAX_SECTIONS sections, each taken from
+    the start of its share of the text, so the cost stays bounded.
+    """
+    section_chars = config.MCQ_SECTION_CHARS
+    num_sections = min(config.MCQ_MAX_SECTIONS, math.ceil(len(full_text) / section_chars))
+    if num_sections <= 1:
+        return [full_text]
+
+    stride = len(full_text) / num_sections
+    sections = []
+    for i in range(num_sections):
+        start = int(i * stride)
+        # Start on a word boundary rather than mid-word.
+        if start > 0:
+            space = full_text.find(" ", start)
+            start = space + 1 if 0 <= space < start + 200 else start
+        end = min(int((i + 1) * stride), start + section_chars)
+        section = full_text[start:end].strip()
+        if section:
+            sections.append(section)
+    return sections
+
+def _deduplicate_mcqs(mcqs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drops questions that are near-duplicates of an earlier one, using embedding
+    similarity when the embedding model is available and exact text otherwise.
+    """
+    if len(mcqs) < 2:
+        return mcqs
+
+    from .embedding_service import get_embedding_service
+    embedding = get_embedding_service()
+    questions = [m["question"] for m in mcqs]
+
+    if embedding is None:
+        seen, unique = set(), []
+        for mcq, q in zip(mcqs, questions):
+            key = re.sub(r'\W+', ' ', q.lower()).strip()
+            if key not in seen:
+                seen.add(key)
+                unique.append(mcq)
+        return unique
+
+    emb = embedding.encode(questions)
+    sims = emb @ emb.T
+    kept = []
+    for i in range(len(mcqs)):
+        if all(sims[i, j] < config.MCQ_DEDUP_SIMILARITY for j in kept):
+            kept.append(i)
+    return [mcqs[i] for i in kept]
+
+def _select_spread(per_section: List[List[Dict[str, Any]]], num_questions: int) -> List[Dict[str, Any]]:
+    """
+    Picks questions round-robin across sections so the quiz covers the whole
+    document, then returns them in document order.
+    """
+    n = len(per_section)
+    # Visit evenly spaced sections first in case there are more sections than questions.
+    first = sorted({int(k * n / num_questions) for k in range(min(num_questions, n))})
+    order = first + [i for i in range(n) if i not in first]
+
+    picked = []
+    depth = 0
+    while len(picked) < num_questions and any(depth < len(qs) for qs in per_section):
+        for idx in order:
+            qs = per_section[idx]
+            if depth < len(qs) and len(picked) < num_questions:
+                picked.append((idx, depth, qs[depth]))
+        depth += 1
+    picked.sort(key=lambda p: (p[0], p[1]))
+    return [mcq for _, _, mcq in picked]
+
+def _generate_sectioned_mcqs(full_text: str, num_questions: int):
+    """
+    Generates questions for every section in parallel (capped by
+    MCQ_SECTION_CONCURRENCY), removes near-duplicates and spreads the final
+    selection across sections. Returns (mcqs, any_response_received).
+    """
+    sections = _partition_sections(full_text)
+    # Ask for a little extra per section so deduplication can still fill the quiz.
+    per_section_count = math.ceil(num_questions / len(sections)) + (1 if len(sections) > 1 else 0)
+    logger.info(f"Generating MCQs over {len(sections)} sections, {per_section_count} each.")
+
+    with metrics.stage("mcq.generate"), ThreadPoolExecutor(max_workers=config.MCQ_SECTION_CONCURRENCY) as pool:
+        raw_texts = list(pool.map(lambda sec: _generate_raw_text_direct(sec, per_section_count), sections))
+
+    with metrics.stage("mcq.parse"):
+        tagged = []
+        for idx, raw_text in enumerate(raw_texts):
+            for mcq in _scavenge_mcqs_from_text(raw_text) if raw_text else []:
+                tagged.append((idx, mcq))
+
+    with metrics.stage("mcq.dedup"):
+        unique = _deduplicate_mcqs([mcq for _, mcq in tagged])
+    unique_ids = {id(mcq) for mcq in unique}
+    per_section = [[] for _ in sections]
+    for idx, mcq in tagged:
+        if id(mcq) in unique_ids:
+            per_section[idx].append(mcq)
+
+    return _select_spread(per_section, num_questions), any(raw_texts)
+
+CONNECTION_ERROR_MCQ = {
+    "question": "System Error: Could not connect to Ollama.",
+    "options": ["Is Ollama running?", "Is the model correct in config?", "Check Terminal", "Retry"],
+    "answer": "Is Ollama running?"
+}
+
+NO_QUESTIONS_MCQ = {
+    "question": "Error: The AI generated text but we couldn't find any questions.",
+    "options": ["Try simpler text", "Check formatting", "Retry", "Ignore"],
+    "answer": "Retry"
+}
+
+# ---------------- STRUCTURED OUTPUT ----------------
+# JSON schema passed as Ollama's `format`, so the model can only emit this shape.
+MCQ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "options": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4},
+                    "answer": {"type": "string"},
+                },
+                "required": ["question", "options", "answer"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+def _structured_prompt(section: str, num_questions: int, avoid: List[str]) -> str:
+    prompt = f"""
+    You are a quiz generator. Create exactly {num_questions} multiple-choice questions based on the text below.
+
+    Respond with JSON: {{"questions": [{{"question": "...", "options": ["...", "...", "...", "..."], "answer": "..."}}]}}
+    Every question has exactly 4 different options, and "answer" is the exact text of the correct option.
+    """
+    if avoid:
+        listed = "\n".join(f"    - {q}" for q in avoid)
+        prompt += f"""
+    Do NOT repeat or rephrase any of these questions:
+{listed}
+    """
+    return prompt + f"""
+    TEXT TO QUIZ:
+    "{section[:config.MCQ_SECTION_CHARS]}"
+    """
+
+def _validate_mcq(item: Any) -> Optional[Dict[str, Any]]:
+    """
+    Returns a cleaned {"question", "options", "answer"} dict, or None if the
+    item is not a usable question (missing fields, not 4 distinct options,
+    answer not among the options).
+    """
+    if not isinstance(item, dict):
+        return None
+    question, options, answer = item.get("question"), item.get("options"), item.get("answer")
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(options, list) or not all(isinstance(o, str) for o in options):
+        return None
+    options = [re.sub(r'^[A-D][\)\.]\s+', '', o.strip()) for o in options]
+    if len(options) != 4 or not all(options) or len({o.lower() for o in options}) != 4:
+        return None
+    if not isinstance(answer, str):
+        return None
+    answer = answer.strip()
+    if len(answer) == 1 and answer.upper() in "ABCD":
+        answer = options["ABCD".index(answer.upper())]
+    if answer not in options:
+        matches = [o for o in options if o.lower() == answer.lower()]
+        if not matches:
+            return None
+        answer = matches[0]
+    return {"question": question.strip(), "options": options, "answer": answer}
+
+class _QuestionStreamParser:
+    """
+    Incrementally scans a streamed {"questions": [{...}, ...]} document and
+    returns each question object as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = None
+
+    def feed(self, chunk: str) -> List[Any]:
+        self.text += chunk
+        items = []
+        for i in range(self._pos, len(self.text)):
+            ch = self.text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._start = i
+            elif ch == "}":
+                if self._depth == 2 and self._start is not None:
+                    try:
+                        items.append(json.loads(self.text[self._start:i + 1]))
+                    except ValueError:
+                        items.append(None)
+                    self._start = None
+                self._depth -= 1
+        self._pos = len(self.text)
+        return items
+
+class _DuplicateFilter:
+    """
+    Streaming counterpart of _deduplicate_mcqs: rejects a question that is a
+    near-duplicate of one already accepted.
+    """
+
+    def __init__(self):
+        from .embedding_service import get_embedding_service
+        self._embedding = get_embedding_service()
+        self._keys = set()
+        self._vectors = []
+        self._lock = threading.Lock()
+
+    def accept(self, question: str) -> bool:
+        key = re.sub(r'\W+', ' ', question.lower()).strip()
+        vector = self._embedding.encode([question])[0] if self._embedding is not None else None
+        with self._lock:
+            if key in self._keys:
+                return False
+            if vector is not None and any(float(vector @ v) >= config.MCQ_DEDUP_SIMILARITY for v in self._vectors):
+                return False
+            self._keys.add(key)
+            if vector is not None:
+                self._vectors.append(vector)
+            return True
+
+def _section_quotas(num_sections: int, num_questions: int) -> Dict[int, int]:
+    """
+    Spreads num_questions over evenly spaced sections, so the quiz covers the
+    whole document the way _select_spread does for the batch path.
+    """
+    spread = min(num_questions, num_sections)
+    used = sorted({int(k * num_sections / spread) for k in range(spread)})
+    quotas = {idx: num_questions // len(used) for idx in used}
+    for idx in used[:num_questions % len(used)]:
+        quotas[idx] += 1
+    return quotas
+
+def _stream_section(section: str, quota: int, duplicates: _DuplicateFilter, emit: Callable[[Dict[str, Any]], None], cancel: threading.Event, state: Dict[str, Any]) -> int:
+    """
+    Streams one section's questions to `emit` and returns how many were
+    accepted. Invalid or duplicate questions are dropped and only the missing
+    number is requested again, up to MCQ_REPAIR_ROUNDS times. If the model
+    ignores the schema entirely, the text is handed to the free-text parser
+    instead.
+    """
+    model_to_use = getattr(config, 'CHATBOT_MODEL_ID', 'llama3.2')
+    options = {"temperature": 0.1, "num_ctx": 4096}
+    accepted: List[str] = []
+
+    for round_no in range(config.MCQ_REPAIR_ROUNDS + 1):
+        missing = quota - len(accepted)
+        if missing <= 0 or cancel.is_set():
+            break
+        if round_no:
+            logger.info(f"Regenerating {missing} invalid or duplicate question(s), round {round_no}.")
+            metrics.MCQ_QUESTIONS.inc(missing, outcome="regenerated")
+
+        parser = _QuestionStreamParser()
+        prompt = _structured_prompt(section, missing, accepted)
+        try:
+            tokens = get_client().stream(prompt, model_to_use, options, timeout=120, format=MCQ_SCHEMA)
+            try:
+                for token in tokens:
+                    state["responses"] += 1
+                    if cancel.is_set():
+                        break
+                    for item in parser.feed(token):
+                        _offer(_validate_mcq(item), quota, accepted, duplicates, emit)
+            finally:
+                tokens.close()
+        except OllamaError as e:
+            logger.error(str(e))
+            break
+
+        # A model without structured-output support may answer in free text.
+        if not accepted and parser.text.strip() and not parser.text.lstrip().startswith("{"):
+            for mcq in _scavenge_mcqs_from_text(parser.text):
+                _offer(mcq, quota, accepted, duplicates, emit)
+    return len(accepted)
+
+def _offer(mcq: Optional[Dict[str, Any]], quota: int, accepted: List[str], duplicates: _DuplicateFilter, emit: Callable[[Dict[str, Any]], None]):
+    if mcq is None:
+        metrics.MCQ_QUESTIONS.inc(outcome="invalid")
+    elif len(accepted) >= quota:
+        return
+    elif not duplicates.accept(mcq["question"]):
+        metrics.MCQ_QUESTIONS.inc(outcome="duplicate")
+    else:
+        metrics.MCQ_QUESTIONS.inc(outcome="valid")
+        accepted.append(mcq["question"])
+        emit(mcq)
+
+def _stream_tagged_mcqs(full_text: str, num_questions: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yields (section index, question) pairs in completion order. When a
+    section comes back short, its shortfall is handed to a section that has
+    not been asked yet, or else (once one finishes) to a section that filled
+    its own quota, nearest first. Each section is given extra work at most once.
+    """
+    sections = _partition_sections(full_text)
+    quotas = _section_quotas(len(sections), num_questions)
+    logger.info(f"Streaming {num_questions} structured MCQs from {len(quotas)} of {len(sections)} sections.")
+
+    out: "queue.Queue" = queue.Queue()
+    cancel = threading.Event()
+    duplicates = _DuplicateFilter()
+    state = {"responses": 0}
+    spares = [idx for idx in range(len(sections)) if idx not in quotas]
+    done = object()
+
+    def run(idx, quota):
+        got = 0
+        try:
+            got = _stream_section(sections[idx], quota, duplicates, lambda mcq: out.put((idx, mcq)), cancel, state)
+        except Exception:
+            logger.exception("Structured MCQ generation failed for a section.")
+        finally:
+            out.put((idx, done, quota - got))
+
+    pool = ThreadPoolExecutor(max_workers=config.MCQ_SECTION_CONCURRENCY)
+    try:
+        with metrics.stage("mcq.generate"):
+            for idx, quota in quotas.items():
+                pool.submit(run, idx, quota)
+            remaining = len(quotas)
+            owed, last_short = 0, 0
+            while remaining:
+                item = out.get()
+                if item[1] is not done:
+                    yield item
+                    continue
+                remaining -= 1
+                idx, _, shortfall = item
+                if shortfall <= 0:
+                    if idx in quotas:
+                        spares.append(idx)
+                elif state["responses"]:
+                    # Ollama is answering, so a short section is worth retrying elsewhere.
+                    owed, last_short = owed + shortfall, idx
+                if owed and spares and not cancel.is_set():
+                    spare = min(spares, key=lambda i: (i in quotas, abs(i - last_short)))
+                    spares.remove(spare)
+                    quotas.pop(spare, None)
+                    logger.info(f"Asking section {spare} for {owed} question(s) other sections came back without.")
+                    pool.submit(run, spare, owed)
+                    remaining += 1
+                    owed = 0
+    finally:
+        # The consumer may stop early (e.g. the client disconnected).
+        cancel.set()
+        pool.shutdown(wait=False)
+
+    if not state["responses"]:
+        raise OllamaError("Could not get a response from Ollama.")
+
+def stream_mcqs(full_text: str, num_questions: int) -> Iterator[Dict[str, Any]]:
+    """
+    Yields validated questions as soon as each one is complete, generating
+    sections in parallel with Ollama's structured-output `format`. Questions
+    arrive in completion order. Raises OllamaError if Ollama never answered.
+    """
+    tagged = _stream_tagged_mcqs(full_text, num_questions)
+    try:
+        for _, mcq in tagged:
+            yield mcq
+    finally:
+        tagged.close()
+
 def generate_meaningful_mcqs(full_text: str, num_questions: int) -> List[Dict[str, Any]]:
     """
     Main function called by app.py
     """
     if not full_text or not full_text.strip():
         return []
+
+    if config.MCQ_STRUCTURED_OUTPUT:
+        try:
+            # Same document order as the sectioned path: by section, then as generated.
+            tagged = sorted(_stream_tagged_mcqs(full_text, num_questions), key=lambda pair: pair[0])
+            mcqs, got_response = [mcq for _, mcq in tagged], True
+        except OllamaError:
+            mcqs, got_response = [], False
+    else:
+        mcqs, got_response = _generate_sectioned_mcqs(full_text, num_questions)
     
-    raw_text = _generate_raw_text_direct(full_text, num_questions)
-    
-    if not raw_text:
-        return [{
-            "question": "System Error: Could not connect to Ollama.",
-            "options": ["Is Ollama running?", "Is the model correct in config?", "Check Terminal", "Retry"],
-            "answer": "Is Ollama running?"
-        }]
-
-    mcqs = _scavenge_mcqs_from_text(raw_text)
-    
+    if not got_response:
+        return [CONNECTION_ERROR_MCQ]
+
     if not mcqs:
-        return [{
-            "question": "Error: The AI generated text but we couldn't find any questions.",
-            "options": ["Try simpler text", "Check formatting", "Retry", "Ignore"],
-            "answer": "Retry"
-        }]
+        return [NO_QUESTIONS_MCQ]
         
-    return mcqs
\ No newline at end of file
+    return mcqs
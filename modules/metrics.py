@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+# ---------------- REGISTRY ----------------
+# A collector returns metric families computed at scrape time, e.g. from a
+# cache's stats(), as (name, "counter" | "gauge", help, [(labels, value), ...]).
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+_metrics: List[_Metric] = []
+_collectors: List[Collector] = []
+
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collector: Collector):
+    _collectors.append(collector)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            families = list(collector())
+        except Exception:
+            logger.exception("Metrics collector failed")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = _register(Histogram(
+    "educademy_request_seconds", "HTTP request latency.", ["endpoint", "method", "status"]))
+STAGE_SECONDS = _register(Histogram(
+    "educademy_stage_seconds", "Time spent in each hot-path stage.", ["stage"]))
+LLM_IN_FLIGHT = _register(Gauge(
+    "educademy_llm_in_flight", "Ollama generations currently running."))
+LLM_REQUESTS = _register(Counter(
+    "educademy_llm_requests_total", "Ollama generations by mode and outcome.", ["mode", "outcome"]))
+LLM_TOKENS = _register(Counter(
+    "educademy_llm_tokens_total", "Tokens reported by Ollama.", ["kind"]))
+MCQ_QUESTIONS = _register(Counter(
+    "educademy_mcq_questions_total", "Structured MCQ candidates by outcome.", ["outcome"]))
+
+
+# ---------------- STAGES ----------------
+def _request_breakdown() -> Optional[list]:
+    """The current request's stage list, if we are on a request thread."""
+    from flask import g, has_request_context
+    if not has_request_context():
+        return None
+    return g.get("metrics_stages")
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into educademy_stage_seconds and the request's breakdown."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        breakdown = _request_breakdown()
+        if breakdown is not None:
+            breakdown.append((name, elapsed))
+
+
+def record_tokens(response: Dict) -> None:
+    """Count prompt/completion tokens from an Ollama response or final stream chunk."""
+    if response.get("prompt_eval_count"):
+        LLM_TOKENS.inc(response["prompt_eval_count"], kind="prompt")
+    if response.get("eval_count"):
+        LLM_TOKENS.inc(response["eval_count"], kind="completion")
+
+
+def init_app(app, slow_request_seconds: float):
+    """Time every request and log the stage breakdown of slow ones."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_stages = []
+
+    @app.after_request
+    def _remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    # Runs once the response (including a streamed body) is finished.
+    @app.teardown_request
+    def _observe_request(exc):
+        start = g.get("metrics_start")
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        status = g.get("metrics_status", 500)
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=status)
+
+        if elapsed >= slow_request_seconds:
+            stages = ", ".join(f"{name}={secs * 1000:.0f}ms" for name, secs in g.get("metrics_stages", []))
+            logger.warning(f"Slow request {request.method} {request.path} -> {status} "
+                           f"took {elapsed * 1000:.0f}ms [{stages or 'no stages'}]")
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask_session.base import ServerSideSessionInterface
+from flask_session.defaults import Defaults
+from flask_session.mongodb import MongoDBSessionInterface
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class CachedMongoSessionInterface(MongoDBSessionInterface):
+    """Server-side sessions in Mongo, keyed by `_id`, with a small read cache.
+
+    Flask-Session's stock MongoDB backend looks sessions up by an unindexed
+    `id` field; here the store id is the document `_id`, so every read, write
+    and delete is a primary-key operation. Expired documents are removed by
+    a TTL index on `expiration`. Unlike the base class, the constructor makes
+    no Mongo round trip; call `ensure_ttl_index()` once Mongo is reachable.
+
+    Decoded sessions are cached in-process for `cache_seconds` (LRU-bounded
+    by `cache_max_entries`), which saves a round trip on the polling and
+    streaming requests a page makes right after each other. A host that did
+    not write a change can therefore serve a session up to `cache_seconds`
+    stale, so keep the window short when running several hosts.
+
+    Unchanged sessions are only re-saved to push their expiry forward once
+    every `refresh_seconds`, instead of on every request.
+    """
+
+    def __init__(self, app, client, db: str, collection: str, cache_seconds: float,
+                 cache_max_entries: int, refresh_seconds: float,
+                 key_prefix: str = Defaults.SESSION_KEY_PREFIX,
+                 use_signer: bool = Defaults.SESSION_USE_SIGNER,
+                 permanent: bool = Defaults.SESSION_PERMANENT,
+                 sid_length: int = Defaults.SESSION_ID_LENGTH,
+                 serialization_format: str = Defaults.SESSION_SERIALIZATION_FORMAT):
+        # Skip MongoDBSessionInterface.__init__: it creates the TTL index
+        # synchronously, which blocks (and fails) start-up while Mongo is down.
+        self.client = client
+        self.store = client[db][collection]
+        self.use_deprecated_method = False
+        ServerSideSessionInterface.__init__(
+            self, app, key_prefix, use_signer, permanent, sid_length, serialization_format
+        )
+        self.cache_seconds = cache_seconds
+        self.cache_max_entries = cache_max_entries
+        self.refresh_seconds = refresh_seconds
+
+        # store_id -> (encoded session, decoded session, cached_at, saved_at)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def ensure_ttl_index(self) -> bool:
+        """Create the TTL index on `expiration`. Returns False if Mongo could not be reached."""
+        try:
+            self.store.create_index("expiration", expireAfterSeconds=0)
+            return True
+        except PyMongoError as e:
+            logger.warning(f"Could not create the session TTL index yet: {e}")
+            return False
+
+    def _cache_put(self, store_id: str, encoded: bytes, data: dict, saved_at: float):
+        with self._cache_lock:
+            self._cache[store_id] = (encoded, data, time.monotonic(), saved_at)
+            self._cache.move_to_end(store_id)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def _retrieve_session_data(self, store_id: str) -> Optional[dict]:
+        with self._cache_lock:
+            entry = self._cache.get(store_id)
+        if entry is not None and time.monotonic() - entry[2] < self.cache_seconds:
+            return dict(entry[1])
+
+        # The TTL monitor only runs about once a minute; don't revive expired sessions.
+        document = self.store.find_one({"_id": store_id, "expiration": {"$gt": datetime.utcnow()}})
+        if document is None:
+            with self._cache_lock:
+                self._cache.pop(store_id, None)
+            return None
+
+        encoded = bytes(document["val"])
+        data = self.serializer.decode(encoded)
+        self._cache_put(store_id, encoded, data, saved_at=entry[3] if entry is not None else 0.0)
+        return dict(data)
+
+    def _delete_session(self, store_id: str) -> None:
+        with self._cache_lock:
+            self._cache.pop(store_id, None)
+        self.store.delete_one({"_id": store_id})
+
+    def _upsert_session(self, session_lifetime: timedelta, session, store_id: str) -> None:
+        encoded = self.serializer.encode(session)
+        now = time.monotonic()
+
+        with self._cache_lock:
+            entry = self._cache.get(store_id)
+        if entry is not None and entry[0] == encoded and now - entry[3] < self.refresh_seconds:
+            return
+
+        self.store.update_one(
+            {"_id": store_id},
+            {"$set": {
+                "val": encoded,
+                "expiration": datetime.utcnow() + session_lifetime,
+            }},
+            upsert=True
+        )
+        self._cache_put(store_id, encoded, dict(session), saved_at=now)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaError(Exception):
+    """Raised when Ollama cannot produce a completion after all retries."""
+
+
+class _InFlight:
+    """A generation other threads with the same request can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[Exception] = None
+
+
+class OllamaClient:
+    """The one way this app talks to Ollama's /api/generate.
+
+    - keep-alive connections from a pooled `requests.Session`
+    - a global cap on concurrent generations (`max_concurrency`)
+    - retries with exponential backoff on connection errors and 5xx responses
+    - single-flight: identical non-streaming requests that arrive while one is
+      already running wait for it and share its result instead of generating again
+    """
+
+    def __init__(self, base_url: str, max_concurrency: int, max_retries: int, backoff_seconds: float):
+        self.generate_url = base_url.rstrip("/") + "/api/generate"
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(max_concurrency, 1))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+
+    def _payload(self, prompt: str, model: str, options: Optional[Dict[str, Any]], stream: bool, format=None) -> Dict[str, Any]:
+        payload = {"model": model, "prompt": prompt, "stream": stream, "options": options or {}}
+        if format is not None:
+            payload["format"] = format
+        return payload
+
+    def _post(self, payload: Dict[str, Any], timeout: float, stream: bool = False) -> requests.Response:
+        """POST with retries. Client errors (4xx) are not retried."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._session.post(self.generate_url, json=payload, timeout=timeout, stream=stream)
+                if response.status_code < 500:
+                    if response.status_code != 200:
+                        raise OllamaError(f"Ollama API Error: {response.status_code} - {response.text}")
+                    return response
+                error = OllamaError(f"Ollama API Error: {response.status_code} - {response.text}")
+                response.close()
+            except requests.exceptions.RequestException as e:
+                error = OllamaError(f"Failed to connect to Ollama: {e}")
+
+            if attempt < self.max_retries:
+                delay = self.backoff_seconds * (2 ** attempt)
+                logger.warning(f"{error}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        raise error
+
+    def generate(self, prompt: str, model: str, options: Optional[Dict[str, Any]] = None, timeout: float = 120, format=None) -> str:
+        """Return the full completion for `prompt`, sharing identical in-flight requests."""
+        payload = self._payload(prompt, model, options, stream=False, format=format)
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+
+        if not leader:
+            logger.info("Joining identical in-flight Ollama request.")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._slots, self._in_flight_gauge(), metrics.stage("llm.generate"):
+                response = self._post(payload, timeout)
+                body = response.json()
+                call.result = body.get("response", "")
+            metrics.record_tokens(body)
+            metrics.LLM_REQUESTS.inc(mode="generate", outcome="ok")
+            return call.result
+        except Exception as e:
+            call.error = e if isinstance(e, OllamaError) else OllamaError(str(e))
+            metrics.LLM_REQUESTS.inc(mode="generate", outcome="error")
+            raise call.error
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def stream(self, prompt: str, model: str, options: Optional[Dict[str, Any]] = None, timeout: float = 120, format=None) -> Iterator[str]:
+        """Yield completion tokens as Ollama produces them."""
+        payload = self._payload(prompt, model, options, stream=True, format=format)
+
+        outcome = "error"
+        try:
+            with self._slots, self._in_flight_gauge(), metrics.stage("llm.stream"):
+                response = self._post(payload, timeout, stream=True)
+                with response:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise OllamaError(chunk["error"])
+                        if chunk.get("response"):
+                            yield chunk["response"]
+                        if chunk.get("done"):
+                            metrics.record_tokens(chunk)
+                            break
+            outcome = "ok"
+        finally:
+            metrics.LLM_REQUESTS.inc(mode="stream", outcome=outcome)
+
+    @contextmanager
+    def _in_flight_gauge(self):
+        metrics.LLM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            metrics.LLM_IN_FLIGHT.dec()
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    """Get or create the process-wide Ollama client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient(
+                config.OLLAMA_BASE_URL,
+                max_concurrency=config.OLLAMA_MAX_CONCURRENCY,
+                max_retries=config.OLLAMA_MAX_RETRIES,
+                backoff_seconds=config.OLLAMA_RETRY_BACKOFF_SECONDS,
+            )
+        return _client
+
@@ -1,53 +1,79 @@
 import logging
-import torch
+import threading
 import hashlib
-from typing import Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Dict, Iterator, List
 
-from langchain_community.llms import Ollama
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 
-from . import config
+from . import config, metrics
+from .vector_store_registry import VectorStoreRegistry
+from .hybrid_index import HybridIndex
+from .index_store import DiskIndexStore
+from .langchain_adapters import PooledOllama, ServiceEmbeddings
+from .embedding_service import embedding_signature, get_embedding_service
+from .answer_cache import SemanticAnswerCache
+from .knowledge_base import KnowledgeBase, KnowledgeBaseStore, document_id
+from .vector_index import build_vector_store, configure_search, index_signature
 
 logger = logging.getLogger(__name__)
 
 class RAGChatbot:
     """A chatbot that uses Ollama and a local RAG pipeline with caching.
     Supports both RAG (document-based) and Normal (general knowledge) chat.
+
+    One instance is shared by the whole app; each chat session is identified
+    by a `session_key` and points at a document in the shared vector store
+    registry, so concurrent students never swap each other's index.
+
+    Every document gets a BM25 index right away. Small documents are embedded
+    before `setup_document` returns; large ones (LAZY_EMBED_MIN_CHUNKS chunks
+    or more) are embedded in the background and answered lexically until the
+    dense index is attached, after which both rankings are fused.
+
+    Separately, each student has a persistent knowledge base that documents
+    can be added to and removed from incrementally; questions can be asked
+    across all of it or a chosen subset of its documents.
     """
 
+    CHUNK_SIZE = 1000
+    CHUNK_OVERLAP = 200
+
     def __init__(self):
         logging.info("Initializing RAG Chatbot with Ollama.")
         
         # Initialize the LLM
-        self.llm = Ollama(
+        self.llm = PooledOllama(
             model=config.CHATBOT_MODEL_ID, 
             temperature=0.2, 
             num_ctx=4096 
         )
         
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Embeddings come from the process-wide shared model
+        self.embedding_model = ServiceEmbeddings()
         
-        # Initialize Embeddings
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL_ID,
-            model_kwargs={"device": device},
-            encode_kwargs={"normalize_embeddings": True, "batch_size": 32},
+        self.vector_stores = VectorStoreRegistry(config.VECTOR_STORE_MEMORY_BUDGET_BYTES)
+        self.index_store = DiskIndexStore(config.INDEX_CACHE_DIRECTORY, config.INDEX_CACHE_MAX_BYTES)
+        self._session_documents: Dict[str, str] = {}
+        self.answer_cache = SemanticAnswerCache(
+            max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+            similarity_threshold=config.ANSWER_CACHE_SIMILARITY,
+            embed=self._embed_question
         )
-        
-        self.retriever = None
-        self._document_hash: Optional[str] = None
-        self._vector_store_cache: Dict[str, FAISS] = {}
+        self._embed_pool = ThreadPoolExecutor(max_workers=config.BACKGROUND_EMBED_WORKERS, thread_name_prefix="embed")
+        self._sessions_lock = threading.Lock()
+        self.kb_store = KnowledgeBaseStore(config.KNOWLEDGE_BASE_DIRECTORY)
+        self._kb_lock = threading.Lock()
         
         # Prompts
         self._rag_prompt: Optional[PromptTemplate] = None
         self._chat_prompt: Optional[PromptTemplate] = None
 
-        logging.info(f"RAG Chatbot initialized with '{config.CHATBOT_MODEL_ID}' on {device}.")
+        logging.info(f"RAG Chatbot initialized with '{config.CHATBOT_MODEL_ID}'.")
 
     def _get_rag_prompt(self) -> PromptTemplate:
         if self._rag_prompt is None:
@@ -76,92 +102,291 @@ Answer:"""
             self._chat_prompt = PromptTemplate.from_template(template)
         return self._chat_prompt
 
-    def setup_document(self, full_text: str):
-        """Process and index a document for RAG with caching."""
+    def _index_key(self, doc_hash: str) -> str:
+        """Disk cache key: the document plus everything that shapes its index."""
+        signature = f"{embedding_signature()}|{index_signature()}|{self.CHUNK_SIZE}|{self.CHUNK_OVERLAP}"
+        return f"{doc_hash}-{hashlib.md5(signature.encode('utf-8')).hexdigest()[:12]}"
+
+    def setup_document(self, full_text: str, session_key: str = "default"):
+        """Process and index a document for RAG and attach it to a session."""
         if not full_text or not full_text.strip():
             logging.warning("Empty document passed to setup_document.")
             return
 
         doc_hash = hashlib.md5(full_text.encode("utf-8")).hexdigest()
 
-        # Check cache first
-        if doc_hash == self._document_hash and doc_hash in self._vector_store_cache:
-            logging.info("Reusing cached vector store.")
-            self.retriever = self._vector_store_cache[doc_hash].as_retriever(
-                search_kwargs={"k": config.TOP_K_RETRIEVED_CHUNKS}
-            )
+        # Check the shared registry first
+        if self.vector_stores.get(doc_hash) is not None:
+            logging.info("Reusing cached document index.")
+            self._attach_document(session_key, doc_hash)
+            return
+
+        # Then the on-disk cache shared by all workers and restarts
+        index_key = self._index_key(doc_hash)
+        if self._load_document(doc_hash) is not None:
+            self._attach_document(session_key, doc_hash)
             return
 
         logging.info(f"Processing new document: {len(full_text)} chars.")
-        
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            add_start_index=True
-        )
 
-        chunks = text_splitter.split_text(full_text)
+        chunks = self._split(full_text)
         if not chunks:
             logging.warning("Text splitting produced no chunks.")
             return
 
-        try:
-            vector_store = FAISS.from_texts(texts=chunks, embedding=self.embedding_model)
-            
-            # Simple LRU-like cache limit
-            self._vector_store_cache[doc_hash] = vector_store
-            if len(self._vector_store_cache) > 5:
-                first_key = next(iter(self._vector_store_cache))
-                del self._vector_store_cache[first_key]
-
-            self._document_hash = doc_hash
-            
-            self.retriever = vector_store.as_retriever(
-                search_kwargs={"k": config.TOP_K_RETRIEVED_CHUNKS}
-            )
-            logging.info("Retriever ready.")
+        with metrics.stage("rag.bm25_build"):
+            index = HybridIndex(chunks, self.embedding_model)
+        self.vector_stores.put(doc_hash, index, index.nbytes())
+        self._attach_document(session_key, doc_hash)
+
+        if len(chunks) >= config.LAZY_EMBED_MIN_CHUNKS:
+            logging.info(f"{len(chunks)} chunks: answering from BM25 while embedding in the background.")
+            self._embed_pool.submit(self._embed_document, doc_hash, index_key, index)
+        else:
+            self._embed_document(doc_hash, index_key, index)
+        logging.info("Retriever ready.")
 
+    def _load_document(self, doc_hash: str) -> Optional[HybridIndex]:
+        """Load a document's index from the disk cache into the registry, or None if it is not there."""
+        with metrics.stage("rag.index_load"):
+            vector_store = self.index_store.load(self._index_key(doc_hash), self.embedding_model)
+        if vector_store is None:
+            return None
+        configure_search(vector_store.index)
+        index = HybridIndex.from_vector_store(vector_store, self.embedding_model)
+        self.vector_stores.put(doc_hash, index, index.nbytes())
+        return index
+
+    def _split(self, full_text: str) -> List[str]:
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.CHUNK_SIZE,
+            chunk_overlap=self.CHUNK_OVERLAP,
+            add_start_index=True
+        )
+        with metrics.stage("rag.split"):
+            return text_splitter.split_text(full_text)
+
+    def _embed_document(self, doc_hash: str, index_key: str, index: HybridIndex):
+        """Build the dense FAISS index for a document and attach it."""
+        try:
+            with metrics.stage("rag.embed"):
+                vector_store = build_vector_store(index.chunks, self.embedding_model)
         except Exception as e:
+            # The document stays searchable through its lexical index.
             logging.error(f"Failed to create FAISS vector store: {e}", exc_info=True)
-            self.retriever = None
+            return
+
+        index.attach_dense(vector_store)
+        self.vector_stores.resize(doc_hash, index.nbytes())
+        try:
+            with metrics.stage("rag.index_save"):
+                self.index_store.save(index_key, vector_store)
+        except OSError:
+            # Logged by the store; the index still serves from memory.
+            pass
+        logging.info(f"Dense index ready for document {doc_hash}.")
+
+    def _attach_document(self, session_key: str, doc_hash: str):
+        with self._sessions_lock:
+            self._session_documents[session_key] = doc_hash
+
+    def _detach_document(self, session_key: str):
+        with self._sessions_lock:
+            self._session_documents.pop(session_key, None)
+
+    def clear_session(self, session_key: str):
+        """Forget which document a session was chatting about (e.g. on logout)."""
+        self._detach_document(session_key)
+
+    def _get_document(self, session_key: str):
+        """Return (doc_hash, HybridIndex) for a session's document, or (None, None) for normal chat."""
+        with self._sessions_lock:
+            doc_hash = self._session_documents.get(session_key)
+        if doc_hash is None:
+            return None, None
+
+        index = self.vector_stores.peek(doc_hash)
+        if index is None:
+            # Evicted from memory: reload it from the disk cache. Only a
+            # document whose dense index was never saved is lost.
+            index = self._load_document(doc_hash)
+        if index is None:
+            logging.info(f"Document index for session '{session_key}' was evicted and is not on disk.")
+            self._detach_document(session_key)
+            return None, None
+
+        return doc_hash, index
 
     def _format_docs(self, docs) -> str:
         """Helper to format retrieved documents into a single string."""
         return "\n\n".join(doc.page_content for doc in docs)
 
-    def answer_query(self, query: str) -> str:
-        """Answer a user's query using RAG if context exists, otherwise normal chat."""
+    def _build_chain(self, query: str, retrieve: Optional[Callable[[str], List[Any]]]):
+        """Pick the RAG chain if there is something to retrieve from, otherwise normal chat."""
+        # MODE 1: RAG (Document or Knowledge Base)
+        if retrieve is not None:
+            logging.info(f"RAG Mode active for query: '{query}'")
+            return (
+                {
+                    "context": RunnableLambda(retrieve) | self._format_docs, 
+                    "question": RunnablePassthrough()
+                }
+                | self._get_rag_prompt()
+                | self.llm
+                | StrOutputParser()
+            )
+
+        # MODE 2: Normal Chat (No Document)
+        logging.info(f"Normal Chat Mode active for query: '{query}'")
+        return (
+            {"question": RunnablePassthrough()}
+            | self._get_normal_chat_prompt()
+            | self.llm
+            | StrOutputParser()
+        )
+
+    def _retrieve(self, index: HybridIndex, query: str):
+        with metrics.stage("rag.retrieve"):
+            return index.search(
+                query, k=config.TOP_K_RETRIEVED_CHUNKS, candidates=config.TOP_K_RETRIEVED_CHUNKS * config.HYBRID_CANDIDATE_MULTIPLIER
+            )
+
+    def _retrieve_knowledge(self, kb: KnowledgeBase, query: str, doc_ids: Optional[List[str]]):
+        with metrics.stage("kb.retrieve"):
+            return kb.search(
+                query, k=config.TOP_K_RETRIEVED_CHUNKS, candidates=config.TOP_K_RETRIEVED_CHUNKS * config.HYBRID_CANDIDATE_MULTIPLIER,
+                doc_ids=doc_ids
+            )
+
+    def _resolve_context(self, session_key: str, use_knowledge_base: bool, doc_ids: Optional[List[str]]):
+        """Return (cache mode, cache scope, retrieve function or None, cacheable) for a question."""
+        if use_knowledge_base:
+            kb = self._get_knowledge_base(session_key)
+            if kb.documents:
+                scope = f"{session_key}:{kb.disk_version}:{kb.version}:{','.join(sorted(doc_ids or []))}"
+                return "kb", scope, lambda q: self._retrieve_knowledge(kb, q, doc_ids), True
+            return "chat", "", None, True
+
+        doc_hash, index = self._get_document(session_key)
+        if index is None:
+            return "chat", "", None, True
+        # Answers from a lexical-only index are not cached; they improve once it is embedded.
+        return "rag", doc_hash, lambda q: self._retrieve(index, q), index.dense_ready
+
+    def _embed_question(self, question: str):
+        """Embedding for the answer cache, or None while documents are being embedded."""
+        service = get_embedding_service()
+        if service is None or service.busy():
+            return None
+        return service.encode([question])[0]
+
+    def answer_query(self, query: str, session_key: str = "default",
+                     use_knowledge_base: bool = False, doc_ids: Optional[List[str]] = None) -> str:
+        """Answer a user's query using RAG if context exists, otherwise normal chat.
+
+        With `use_knowledge_base`, context comes from the student's knowledge
+        base (optionally only the documents in `doc_ids`) instead of the
+        session's current document.
+        """
         if not query.strip():
             return "Please provide a valid question."
 
         try:
-            # MODE 1: RAG (Document Based)
-            if self.retriever:
-                logging.info(f"RAG Mode active for query: '{query}'")
-                rag_chain = (
-                    {
-                        "context": self.retriever | self._format_docs, 
-                        "question": RunnablePassthrough()
-                    }
-                    | self._get_rag_prompt()
-                    | self.llm
-                    | StrOutputParser()
-                )
-                response = rag_chain.invoke(query)
-                return response.strip()
-            
-            # MODE 2: Normal Chat (No Document)
-            else:
-                logging.info(f"Normal Chat Mode active for query: '{query}'")
-                normal_chain = (
-                    {"question": RunnablePassthrough()}
-                    | self._get_normal_chat_prompt()
-                    | self.llm
-                    | StrOutputParser()
-                )
-                response = normal_chain.invoke(query)
-                return response.strip()
+            mode, scope, retrieve, cacheable = self._resolve_context(session_key, use_knowledge_base, doc_ids)
+            with metrics.stage("rag.answer_cache"):
+                cached, vector = self.answer_cache.lookup(mode, scope, query)
+            if cached is not None:
+                logging.info("Answer served from cache.")
+                return cached
+
+            response = self._build_chain(query, retrieve).invoke(query).strip()
+            if response and cacheable:
+                self.answer_cache.store(mode, scope, query, response, vector)
+            return response
 
         except Exception as e:
             logging.error("Error during chain invocation", exc_info=True)
-            return "I encountered an error while processing your request. Please ensure Ollama is running."
\ No newline at end of file
+            return "I encountered an error while processing your request. Please ensure Ollama is running."
+
+    def stream_query(self, query: str, session_key: str = "default",
+                     use_knowledge_base: bool = False, doc_ids: Optional[List[str]] = None) -> Iterator[str]:
+        """Like `answer_query`, but yields answer tokens as Ollama generates them."""
+        if not query.strip():
+            yield "Please provide a valid question."
+            return
+
+        try:
+            mode, scope, retrieve, cacheable = self._resolve_context(session_key, use_knowledge_base, doc_ids)
+            with metrics.stage("rag.answer_cache"):
+                cached, vector = self.answer_cache.lookup(mode, scope, query)
+            if cached is not None:
+                logging.info("Answer served from cache.")
+                yield cached
+                return
+
+            tokens = []
+            for token in self._build_chain(query, retrieve).stream(query):
+                tokens.append(token)
+                yield token
+
+            response = "".join(tokens).strip()
+            if response and cacheable:
+                self.answer_cache.store(mode, scope, query, response, vector)
+
+        except Exception as e:
+            logging.error("Error during chain streaming", exc_info=True)
+            yield "I encountered an error while processing your request. Please ensure Ollama is running."
+
+    # ---------------- KNOWLEDGE BASE ----------------
+    def _get_knowledge_base(self, student: str) -> KnowledgeBase:
+        """The student's knowledge base, reloaded if another worker saved a different copy."""
+        key = f"kb:{student}"
+        with self._kb_lock:
+            kb = self.vector_stores.peek(key)
+            if kb is None or self.kb_store.version(student) != kb.disk_version:
+                kb = self.kb_store.load(student, self.embedding_model)
+                self.vector_stores.put(key, kb, kb.nbytes())
+            return kb
+
+    def add_to_knowledge_base(self, student: str, full_text: str, filename: str) -> Dict[str, Any]:
+        """Append a document to the student's knowledge base; only its chunks are embedded."""
+        kb = self._get_knowledge_base(student)
+        doc_id = document_id(full_text)
+        if doc_id in kb.documents:
+            return {"doc_id": doc_id, "filename": kb.documents[doc_id]["filename"], "added": False}
+        if len(kb.documents) >= config.KB_MAX_DOCUMENTS:
+            raise ValueError(f"Knowledge base is full ({config.KB_MAX_DOCUMENTS} documents).")
+
+        chunks = self._split(full_text)
+        if not chunks:
+            raise ValueError("No text to index.")
+
+        # Embed before taking the lock; only reload -> add -> save is serialized.
+        with metrics.stage("kb.embed"):
+            vectors = self.embedding_model.embed_documents(chunks)
+
+        with self.kb_store.locked(student):
+            kb = self._get_knowledge_base(student)
+            if doc_id in kb.documents:
+                return {"doc_id": doc_id, "filename": kb.documents[doc_id]["filename"], "added": False}
+            if len(kb.documents) >= config.KB_MAX_DOCUMENTS:
+                raise ValueError(f"Knowledge base is full ({config.KB_MAX_DOCUMENTS} documents).")
+            added = kb.add_document(doc_id, filename, chunks, vectors)
+            if added:
+                self.vector_stores.resize(f"kb:{student}", kb.nbytes())
+                with metrics.stage("kb.save"):
+                    self.kb_store.save(student, kb)
+        return {"doc_id": doc_id, "filename": filename, "chunks": len(chunks), "added": added}
+
+    def remove_from_knowledge_base(self, student: str, doc_id: str) -> bool:
+        with self.kb_store.locked(student):
+            kb = self._get_knowledge_base(student)
+            if not kb.remove_document(doc_id):
+                return False
+            self.vector_stores.resize(f"kb:{student}", kb.nbytes())
+            with metrics.stage("kb.save"):
+                self.kb_store.save(student, kb)
+        return True
+
+    def list_knowledge_base(self, student: str) -> List[Dict[str, Any]]:
+        return self._get_knowledge_base(student).list_documents()
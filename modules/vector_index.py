@@ -0,0 +1,140 @@
+import logging
+import math
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+FLAT = "flat"
+HNSW = "hnsw"
+IVF_PQ = "ivfpq"
+INDEX_TYPES = (FLAT, HNSW, IVF_PQ)
+
+# k-means wants roughly this many training points per centroid.
+_MIN_POINTS_PER_CENTROID = 39
+_PQ_CENTROIDS = 256
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """Index type for a corpus of `num_vectors`, honouring config.VECTOR_INDEX_TYPE.
+
+    "auto" keeps exact search for small corpora (one handout), uses HNSW when
+    flat scans get slow, and IVF-PQ once full-precision vectors plus the HNSW
+    graph no longer fit comfortably in memory. IVF-PQ candidates are re-ranked
+    against 8-bit scalar-quantized vectors, since PQ distances alone lose too
+    much recall.
+    """
+    configured = config.VECTOR_INDEX_TYPE
+    if configured != "auto":
+        if configured not in INDEX_TYPES:
+            raise ValueError(f"Unknown VECTOR_INDEX_TYPE '{configured}'")
+        chosen = configured
+    elif num_vectors <= config.ANN_FLAT_MAX_VECTORS:
+        chosen = FLAT
+    elif num_vectors <= config.ANN_HNSW_MAX_VECTORS:
+        chosen = HNSW
+    else:
+        chosen = IVF_PQ
+    return chosen
+
+
+def index_signature() -> str:
+    """Everything about the index layout that should invalidate cached indexes."""
+    return (f"{config.VECTOR_INDEX_TYPE}|{config.ANN_FLAT_MAX_VECTORS}|{config.ANN_HNSW_MAX_VECTORS}"
+            f"|{config.ANN_HNSW_M}|{config.ANN_PQ_SUBQUANTIZERS}|refine-sq8")
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest divisor of `dim` not above the configured number of subquantizers."""
+    m = min(config.ANN_PQ_SUBQUANTIZERS, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def _ivf_lists(num_vectors: int) -> int:
+    nlist = int(4 * math.sqrt(num_vectors))
+    return max(1, min(nlist, num_vectors // _MIN_POINTS_PER_CENTROID))
+
+
+def build_index(vectors: np.ndarray, index_type: Optional[str] = None) -> faiss.Index:
+    """Build, train if needed, and fill a FAISS index over `vectors` (L2 metric)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dim = vectors.shape
+    index_type = index_type or choose_index_type(num_vectors)
+    if index_type == IVF_PQ and num_vectors < _PQ_CENTROIDS * _MIN_POINTS_PER_CENTROID:
+        # Too few points to train the PQ codebooks well; exact search is cheap at this size anyway.
+        index_type = FLAT
+
+    if index_type == FLAT:
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == HNSW:
+        index = faiss.IndexHNSWFlat(dim, config.ANN_HNSW_M)
+        index.hnsw.efConstruction = config.ANN_HNSW_EF_CONSTRUCTION
+    elif index_type == IVF_PQ:
+        nlist = _ivf_lists(num_vectors)
+        index = faiss.index_factory(dim, f"IVF{nlist},PQ{_pq_subquantizers(dim)},Refine(SQ8)")
+        sample = vectors
+        if num_vectors > config.ANN_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(num_vectors, config.ANN_TRAIN_SAMPLE, replace=False)
+            sample = vectors[np.sort(rows)]
+        logger.info(f"Training IVF-PQ index (nlist={nlist}) on {len(sample)} of {num_vectors} vectors.")
+        index.train(sample)
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'")
+
+    index.add(vectors)
+    configure_search(index)
+    return index
+
+
+def configure_search(index: faiss.Index) -> faiss.Index:
+    """Apply the configured recall/speed knobs, e.g. to an index loaded from disk."""
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = config.ANN_REFINE_K_FACTOR
+        configure_search(faiss.downcast_index(index.base_index))
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.ANN_HNSW_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(config.ANN_IVF_NPROBE, index.nlist)
+    return index
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """Approximate resident size of a FAISS index."""
+    n, d = index.ntotal, index.d
+    if isinstance(index, faiss.IndexRefine):
+        refine = faiss.downcast_index(index.refine_index)
+        return index_nbytes(faiss.downcast_index(index.base_index)) + n * refine.code_size
+    if isinstance(index, faiss.IndexHNSW):
+        # Full vectors plus about 2*M neighbour ids per vector on the base layer.
+        return n * d * 4 + n * index.hnsw.nb_neighbors(0) * 4
+    if isinstance(index, faiss.IndexIVF):
+        # Codes and ids per vector, plus the coarse centroids.
+        return n * (index.code_size + 8) + index.nlist * d * 4
+    return n * d * 4
+
+
+def build_vector_store(texts: List[str], embedding, metadatas: Optional[List[Dict[str, Any]]] = None,
+                       index_type: Optional[str] = None) -> FAISS:
+    """Like `FAISS.from_texts`, but over an index chosen by `choose_index_type`.
+
+    Vectors are added in `texts` order, so index positions are chunk indices.
+    """
+    vectors = np.array(embedding.embed_documents(texts), dtype=np.float32)
+    index = build_index(vectors, index_type)
+    metadatas = metadatas or [{} for _ in texts]
+    documents = {str(i): Document(page_content=t, metadata=m) for i, (t, m) in enumerate(zip(texts, metadatas))}
+    return FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=InMemoryDocstore(documents),
+        index_to_docstore_id={i: str(i) for i in range(len(texts))},
+    )
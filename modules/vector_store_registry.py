@@ -0,0 +1,96 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreRegistry:
+    """A process-wide registry of vector stores shared by all chat sessions.
+
+    Stores are keyed by document hash so two students uploading the same
+    handout share one index. Entries are evicted least-recently-used once the
+    estimated memory footprint exceeds the configured byte budget.
+
+    `get` counts hits and misses and is meant for lookups that could share a
+    store (a new upload); per-query lookups of a session's own store use
+    `peek`, so the hit rate measures reuse rather than traffic.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the store for `key` and mark it as recently used."""
+        with self._lock:
+            store = self._entries.get(key)
+            if store is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return store
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Like `get`, but without counting a hit or miss."""
+        with self._lock:
+            store = self._entries.get(key)
+            if store is not None:
+                self._entries.move_to_end(key)
+            return store
+
+    def put(self, key: str, store: Any, nbytes: int):
+        """Insert or replace a store, evicting old entries to stay within budget."""
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            self._entries[key] = store
+            self._sizes[key] = nbytes
+            self._total_bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until within budget. Caller holds the lock."""
+        # Always keep the newest entry, even if it alone exceeds the budget.
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, _ = self._entries.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(old_key)
+            self.evictions += 1
+            logger.info(f"Evicted vector store {old_key} from registry.")
+
+    def resize(self, key: str, nbytes: int):
+        """Update an entry's size (e.g. after its dense index was attached), if still present."""
+        with self._lock:
+            if key not in self._entries:
+                return
+            self._total_bytes += nbytes - self._sizes[key]
+            self._sizes[key] = nbytes
+            self._evict()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot of size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
@@ -1,5 +1,36 @@
 document.addEventListener('DOMContentLoaded', function() {
 
+    // fetch() that gives up after `ms` milliseconds.
+    async function fetchWithTimeout(url, options, ms) {
+        const controller = new AbortController();
+        const timeoutId = setTimeout(() => controller.abort(), ms);
+        try {
+            return await fetch(url, { ...options, signal: controller.signal });
+        } finally {
+            clearTimeout(timeoutId);
+        }
+    }
+
+    // Submit a background job and poll its status until it finishes. Each
+    // request has its own timeout; the job itself may run as long as it needs.
+    async function runJob(url, formData) {
+        const res = await fetchWithTimeout(url, { method: "POST", body: formData }, 60000);
+        const submitted = await res.json().catch(() => ({}));
+        if (!res.ok) throw new Error(submitted.error || `Server error: ${res.status}`);
+
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1500));
+
+            const statusRes = await fetchWithTimeout(submitted.status_url, {}, 15000);
+            if (!statusRes.ok) throw new Error(`Server error: ${statusRes.status}`);
+            const job = await statusRes.json();
+            if (job.status === "done") return job.result;
+            if (job.status === "failed") throw new Error(job.error || "Job failed");
+        }
+    }
+    // Pages with their own inline scripts (the quiz page) use it too.
+    window.runJob = runJob;
+
     const authModal = document.getElementById('authModal');
     if (authModal) {
         const preloader = document.getElementById("preloader");
@@ -49,20 +80,8 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             
             try {
-                const controller = new AbortController();
-                const timeoutId = setTimeout(() => controller.abort(), 120000);
-                
-                let res = await fetch("/summarize", { 
-                    method: "POST", 
-                    body: formData,
-                    signal: controller.signal
-                });
-                clearTimeout(timeoutId);
-                
-                if (!res.ok) throw new Error(`Server error: ${res.status}`);
-                let data = await res.json();
-                if(data.error) throw new Error(data.error);
-                summaryResult.innerHTML = "<h3>Summary:</h3><div>" + data.summary.replace(/\n/g, '<br>') + "</div>";
+                const summary = await runJob("/jobs/summarize", formData);
+                summaryResult.innerHTML = "<h3>Summary:</h3><div>" + summary.replace(/\n/g, '<br>') + "</div>";
             } catch (error) {
                 if (error.name === 'AbortError') {
                     summaryResult.innerHTML = `<p style="color:red;">⚠️ Request timed out. Please try again.</p>`;
@@ -107,6 +126,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const formData = new FormData();
             if (question) formData.append("question", question);
             if (file) formData.append("file", file);
+            formData.append("stream", "1");
 
             try {
                 const controller = new AbortController();
@@ -117,13 +137,37 @@ document.addEventListener('DOMContentLoaded', function() {
                     body: formData,
                     signal: controller.signal
                 });
-                clearTimeout(timeoutId);
                 
-                if (!res.ok) throw new Error(`Server error: ${res.status}`);
-                const data = await res.json();
-                loadingMsg.remove();
-                const aiMsgHtml = `<b>AI:</b> ${data.answer || 'Sorry, I could not find an answer.'}`;
-                appendMessage(aiMsgHtml, 'ai');
+                if (!res.ok) {
+                    clearTimeout(timeoutId);
+                    const data = await res.json().catch(() => ({}));
+                    throw new Error(data.answer || `Server error: ${res.status}`);
+                }
+
+                // The answer arrives as NDJSON lines: {"token": "..."} ... {"done": true}
+                const answerSpan = streamMessage(loadingMsg);
+                const reader = res.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                let answer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    const lines = buffer.split('\n');
+                    buffer = lines.pop();
+                    for (const line of lines) {
+                        if (!line.trim()) continue;
+                        const msg = JSON.parse(line);
+                        if (msg.token) {
+                            answer += msg.token;
+                            answerSpan.textContent = answer;
+                            chatArea.scrollTop = chatArea.scrollHeight;
+                        }
+                    }
+                }
+                clearTimeout(timeoutId);
+                if (!answer.trim()) answerSpan.textContent = 'Sorry, I could not find an answer.';
             } catch (err) {
                 loadingMsg.innerHTML = `<b>AI:</b> ${err.name === 'AbortError' ? 'Request timed out. Please try again.' : 'Error getting response.'}`;
             } finally {
@@ -135,6 +179,15 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
 
+        function streamMessage(msgDiv) {
+            msgDiv.style.color = '';
+            msgDiv.innerHTML = '<b>AI:</b> ';
+            const span = document.createElement('span');
+            span.style.whiteSpace = 'pre-wrap';
+            msgDiv.appendChild(span);
+            return span;
+        }
+
         function appendMessage(innerHTML, type) {
             const msgDiv = document.createElement('div');
             msgDiv.style.margin = '0.5em 0';
@@ -145,104 +198,6 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    const mcqForm = document.getElementById("mcqForm");
-    if (mcqForm) {
-        const resultDiv = document.getElementById("mcqResult");
-        const scoreDiv = document.getElementById("quizScore");
-        const loading = document.getElementById("loading");
-        let isProcessing = false;
-
-        mcqForm.addEventListener("submit", async (e) => {
-            e.preventDefault();
-            if (isProcessing) return;
-            isProcessing = true;
-            
-            resultDiv.innerHTML = "";
-            scoreDiv.innerHTML = "";
-            loading.style.display = "block";
-            const submitBtn = mcqForm.querySelector('button[type="submit"]');
-            const originalBtnText = submitBtn ? submitBtn.textContent : '';
-            if (submitBtn) {
-                submitBtn.disabled = true;
-                submitBtn.textContent = "Generating...";
-            }
-
-            try {
-                const formData = new FormData(mcqForm);
-                const controller = new AbortController();
-                const timeoutId = setTimeout(() => controller.abort(), 120000);
-                
-                const res = await fetch("/generate_quiz", { 
-                    method: "POST", 
-                    body: formData,
-                    signal: controller.signal
-                });
-                clearTimeout(timeoutId);
-                
-                if (!res.ok) throw new Error("Server error: Failed to generate MCQs");
-                const data = await res.json();
-                loading.style.display = "none";
-
-                if (!data.mcqs || data.mcqs.length === 0) {
-                    resultDiv.innerHTML = "<p>No MCQs were generated. Please try again.</p>";
-                    return;
-                }
-
-                let html = "<h3>Generated MCQs:</h3>";
-                data.mcqs.forEach((mcq, idx) => {
-                    const escapedAnswer = mcq.answer.replace(/"/g, '&quot;');
-                    const escapedQuestion = mcq.question.replace(/"/g, '&quot;');
-                    html += `
-                        <div class="mcq-block" data-answer="${escapedAnswer}">
-                            <p><b>Q${idx + 1}:</b> ${escapedQuestion}</p>
-                            <fieldset>
-                                ${mcq.options.map(opt => {
-                                    const escapedOpt = opt.replace(/"/g, '&quot;');
-                                    return `<label><input type="radio" name="q${idx}" value="${escapedOpt}"> ${opt}</label><br>`;
-                                }).join('')}
-                            </fieldset>
-                        </div>`;
-                });
-                html += `<button type="button" id="submitQuizBtn">Submit Quiz</button>`;
-                resultDiv.innerHTML = html;
-                document.getElementById("submitQuizBtn").addEventListener("click", checkAnswers);
-
-            } catch (error) {
-                loading.style.display = "none";
-                const errorMsg = error.name === 'AbortError' ? 'Request timed out. Please try again.' : error.message;
-                resultDiv.innerHTML = `<p style="color:red;">⚠️ ${errorMsg}</p>`;
-            } finally {
-                isProcessing = false;
-                if (submitBtn) {
-                    submitBtn.disabled = false;
-                    submitBtn.textContent = originalBtnText;
-                }
-            }
-        });
-
-        function checkAnswers() {
-            const allQuestions = document.querySelectorAll('.mcq-block');
-            let score = 0;
-            allQuestions.forEach(questionBlock => {
-                const correctAnswer = questionBlock.dataset.answer;
-                const selectedRadio = questionBlock.querySelector('input[type="radio"]:checked');
-                questionBlock.style.border = '1px solid #ddd'; 
-                if (selectedRadio) {
-                    if (selectedRadio.value === correctAnswer) {
-                        score++;
-                        questionBlock.style.border = '2px solid #28a745';
-                    } else {
-                        questionBlock.style.border = '2px solid #dc3545';
-                    }
-                } else {
-                    questionBlock.style.border = '2px solid #ffc107';
-                }
-            });
-            scoreDiv.innerHTML = `<h3>Your Score: ${score} out of ${allQuestions.length}</h3>`;
-            scoreDiv.scrollIntoView({ behavior: 'smooth' });
-        }
-    }
-
     const avatarImg = document.getElementById('avatarImg');
     if (avatarImg) {
 
@@ -0,0 +1,245 @@
+import threading
+
+import pytest
+from pymongo import InsertOne
+from pymongo.errors import AutoReconnect, BulkWriteError, ServerSelectionTimeoutError
+
+from modules.bulk_writer import DUPLICATE_KEY, BulkWriter
+
+
+class FakeCollection:
+    """Records bulk_write calls; `failures` are raised (in order) before writing."""
+
+    def __init__(self):
+        self.batches = []
+        self.applied = []
+        self.failures = []
+
+    def bulk_write(self, ops, ordered=True):
+        self.batches.append(list(ops))
+        if self.failures:
+            failure = self.failures.pop(0)
+            if callable(failure):
+                failure = failure(ops)
+            raise failure
+        self.applied.extend(ops)
+
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+@pytest.fixture
+def db():
+    return FakeDB()
+
+
+@pytest.fixture
+def make_writer(db):
+    writers = []
+
+    def make(**overrides):
+        options = dict(max_batch=100, flush_seconds=0.05, max_queue=100, enqueue_timeout=0.05,
+                       max_retries=2, retry_backoff=0)
+        options.update(overrides)
+        writer = BulkWriter(db, **options)
+        writers.append(writer)
+        return writer
+    yield make
+    for writer in writers:
+        writer.close()
+
+
+def _kinds(ops):
+    return [type(op).__name__ for op in ops]
+
+
+def test_batches_each_collection_in_enqueue_order(db, make_writer):
+    writer = make_writer()
+    log_id = writer.insert_one("session_logs", {"username": "ann"})
+    writer.update_one("session_logs", {"_id": log_id}, {"$set": {"logout_time": 1}})
+    writer.insert_one("summaries", {"student": "ann"})
+    writer.flush()
+
+    assert len(db["session_logs"].batches) == 1
+    assert _kinds(db["session_logs"].applied) == ["InsertOne", "UpdateOne"]
+    assert len(db["summaries"].applied) == 1
+    assert writer.stats()["written"] == 3
+
+
+def test_max_batch_splits_bulk_writes(db, make_writer):
+    writer = make_writer(max_batch=2, flush_seconds=1)
+    for i in range(5):
+        writer.insert_one("summaries", {"n": i})
+    writer.flush()
+
+    assert [len(b) for b in db["summaries"].batches] == [2, 2, 1]
+
+
+def test_duplicate_key_is_skipped_and_the_rest_written(db, make_writer):
+    db["summaries"].failures.append(lambda ops: BulkWriteError(
+        {"writeErrors": [{"index": 1, "code": DUPLICATE_KEY, "errmsg": "dup"}]}))
+    writer = make_writer()
+    for i in range(3):
+        writer.insert_one("summaries", {"n": i})
+    writer.flush()
+
+    assert [op._doc["n"] for op in db["summaries"].applied] == [2]
+    stats = writer.stats()
+    assert stats["duplicates_skipped"] == 1 and stats["written"] == 2 and stats["failed"] == 0
+
+
+def test_write_concern_only_error_counts_as_written_and_keeps_the_thread(db, make_writer):
+    db["summaries"].failures.append(BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"code": 64}]}))
+    writer = make_writer()
+    writer.insert_one("summaries", {"n": 1})
+    writer.flush()
+    writer.insert_one("summaries", {"n": 2})
+    writer.flush()
+
+    assert writer._worker.is_alive()
+    assert writer.stats()["written"] == 2 and writer.stats()["failed"] == 0
+
+
+def test_unexpected_error_is_dropped_and_logged_without_killing_the_thread(db, make_writer):
+    db["summaries"].failures.append(BulkWriteError({}))  # No details at all.
+    writer = make_writer()
+    writer.insert_one("summaries", {"n": 1})
+    writer.flush()
+    writer.insert_one("summaries", {"n": 2})
+    writer.flush()
+
+    assert writer._worker.is_alive()
+    assert [op._doc["n"] for op in db["summaries"].applied] == [2]
+
+
+def test_interrupted_batch_retries_only_idempotent_operations(db, make_writer):
+    db["student_rollups"].failures.append(AutoReconnect("connection reset"))
+    writer = make_writer()
+    writer.insert_one("student_rollups", {"_id": "ann"})
+    writer.update_one("student_rollups", {"_id": "ann"}, {"$inc": {"quiz_count": 1}})
+    writer.update_one("student_rollups", {"_id": "ann"}, {"$set": {"backfilled": True}})
+    writer.flush()
+
+    assert _kinds(db["student_rollups"].applied) == ["InsertOne", "UpdateOne"]
+    assert db["student_rollups"].applied[1]._doc == {"$set": {"backfilled": True}}
+    stats = writer.stats()
+    assert stats["failed"] == 1 and stats["retries"] == 1 and stats["written"] == 2
+
+
+def test_unreachable_server_retries_the_whole_batch(db, make_writer):
+    db["student_rollups"].failures += [ServerSelectionTimeoutError("down")] * 2
+    writer = make_writer()
+    writer.update_one("student_rollups", {"_id": "ann"}, {"$inc": {"quiz_count": 1}}, upsert=True)
+    writer.flush()
+
+    assert len(db["student_rollups"].applied) == 1
+    assert writer.stats()["retries"] == 2 and writer.stats()["failed"] == 0
+
+
+def test_gives_up_after_max_retries(db, make_writer):
+    db["summaries"].failures += [ServerSelectionTimeoutError("down")] * 5
+    writer = make_writer(max_retries=2)
+    writer.insert_one("summaries", {"n": 1})
+    writer.flush()
+
+    assert len(db["summaries"].batches) == 3
+    assert writer.stats()["failed"] == 1 and writer.stats()["written"] == 0
+
+
+def test_full_queue_falls_back_to_a_synchronous_write(db, make_writer):
+    writer = make_writer(max_batch=1, max_queue=1, enqueue_timeout=0.01)
+    release = threading.Event()
+
+    def slow_server(ops):
+        release.wait(5)
+        return ServerSelectionTimeoutError("slow")
+    db["summaries"].failures.append(slow_server)
+
+    writer.insert_one("summaries", {"n": 1})  # Taken by the worker, which then blocks.
+    while writer._queue.qsize():
+        pass
+    writer.insert_one("summaries", {"n": 2})  # Fills the queue.
+    writer.insert_one("summaries", {"n": 3})  # Written synchronously.
+    assert writer.stats()["sync_fallbacks"] == 1
+    assert [op._doc["n"] for op in db["summaries"].applied] == [3]
+
+    release.set()
+    writer.flush()
+    assert sorted(op._doc["n"] for op in db["summaries"].applied) == [1, 2, 3]
+
+
+def test_close_drains_the_queue(db, make_writer):
+    writer = make_writer(flush_seconds=5)
+    for i in range(3):
+        writer.insert_one("summaries", {"n": i})
+    writer.close()
+
+    assert len(db["summaries"].applied) == 3
+    writer.insert_one("summaries", {"n": 3})  # After close: written directly.
+    assert len(db["summaries"].applied) == 4
+
+
+def test_insert_returns_the_client_side_id(db, make_writer):
+    writer = make_writer()
+    log_id = writer.insert_one("session_logs", {"username": "ann"})
+    writer.flush()
+
+    assert isinstance(db["session_logs"].applied[0], InsertOne)
+    assert db["session_logs"].applied[0]._doc["_id"] == log_id
+
+
+def test_call_runs_between_what_was_queued_before_and_after(db, make_writer):
+    writer = make_writer(flush_seconds=1)
+    writer.insert_one("quiz_results", {"n": 1})
+    seen = []
+
+    def snapshot():
+        seen.append(len(db["quiz_results"].applied))
+        writer.insert_one("quiz_results", {"n": 2})  # Queued behind the call, not written during it.
+        seen.append(len(db["quiz_results"].applied))
+        return "done"
+
+    assert writer.call(snapshot) == "done"
+    writer.flush()
+    assert seen == [1, 1]
+    assert len(db["quiz_results"].applied) == 2
+
+
+def test_call_raises_the_functions_error(make_writer):
+    writer = make_writer()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        writer.call(fail)
+    assert writer._worker.is_alive()
+
+
+def test_group_keeps_its_operations_together(db, make_writer):
+    writer = make_writer(flush_seconds=1)
+    entered, release = threading.Event(), threading.Event()
+
+    def record():
+        with writer.group():
+            writer.insert_one("quiz_results", {"n": 1})
+            entered.set()
+            release.wait(5)
+            writer.update_one("student_rollups", {"_id": "ann"}, {"$inc": {"quiz_count": 1}})
+
+    recording = threading.Thread(target=record)
+    recording.start()
+    entered.wait(5)
+    seen = []
+    calling = threading.Thread(target=writer.call, args=(
+        lambda: seen.append((len(db["quiz_results"].applied), len(db["student_rollups"].applied))),))
+    calling.start()
+    release.set()
+    recording.join()
+    calling.join()
+
+    # The call waited for the whole group, not just the insert queued before it.
+    assert seen == [(1, 1)]
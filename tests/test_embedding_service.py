@@ -0,0 +1,70 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from modules import embedding_service
+
+
+class FakeModel:
+    """Embeds a text as [len(text), 0, 0, 1] and records each batch it encodes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def eval(self):
+        pass
+
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        time.sleep(0.002)
+        return np.array([[len(t), 0, 0, 1] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    import sentence_transformers
+    model = FakeModel()
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", lambda *args, **kwargs: model)
+    svc = embedding_service.EmbeddingService("fake", "cpu", max_batch_size=8, batch_window_ms=1)
+    svc.model = model
+    return svc
+
+
+def test_large_request_is_sliced_and_reassembled_in_order(service):
+    texts = ["x" * (i + 1) for i in range(30)]
+
+    vectors = service.encode(texts)
+
+    assert vectors[:, 0].tolist() == [len(t) for t in texts]
+    assert max(len(b) for b in service.model.batches) <= 8
+
+
+def test_large_interactive_request_is_not_queued_behind_bulk_work(service):
+    bulk_texts = ["doc"] * 400
+    grading = ["answer"] * 20  # More than max_batch_size, but not bulk.
+    done = {}
+    indexing = threading.Thread(target=lambda: done.setdefault("bulk", service.encode(bulk_texts, bulk=True)))
+    indexing.start()
+    while not service.busy():
+        time.sleep(0.001)
+
+    service.encode(grading)
+    indexing.join()
+
+    batches = service.model.batches
+    last_grading = max(i for i, b in enumerate(batches) if "answer" in b)
+    bulk_batches = [i for i, b in enumerate(batches) if "doc" in b]
+    # Grading finished while most of the document was still queued.
+    assert sum(i > last_grading for i in bulk_batches) > len(bulk_batches) // 2
+    assert len(done["bulk"]) == len(bulk_texts)
+    assert not service.busy()
+
+
+def test_busy_only_counts_bulk_work(service):
+    service.encode(["q"] * 30)
+    assert not service.busy()
@@ -0,0 +1,58 @@
+import errno
+import os
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from modules import index_store
+from modules.index_store import DiskIndexStore
+
+TEXTS = ["Photosynthesis turns light into chemical energy.", "Chlorophyll absorbs red and blue light."]
+
+
+@pytest.fixture
+def embedding():
+    return DeterministicFakeEmbedding(size=16)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskIndexStore(str(tmp_path), max_bytes=10 * 1024 * 1024)
+
+
+def test_save_and_load_round_trip(store, embedding):
+    store.save("doc", FAISS.from_texts(TEXTS, embedding))
+
+    loaded = store.load("doc", embedding)
+    assert sorted(d.page_content for d in loaded.docstore._dict.values()) == sorted(TEXTS)
+    assert store.load("missing", embedding) is None
+
+
+def test_save_losing_the_rename_race_keeps_the_other_entry(store, embedding, monkeypatch):
+    vector_store = FAISS.from_texts(TEXTS, embedding)
+    real_replace = os.replace
+
+    def other_worker_saved_first(src, dst):
+        real_replace(src, dst)
+        os.makedirs(src)
+        raise OSError(errno.ENOTEMPTY, "Directory not empty")
+
+    monkeypatch.setattr(index_store.os, "replace", other_worker_saved_first)
+    store.save("doc", vector_store)
+
+    assert store.load("doc", embedding) is not None
+    assert [name for name in os.listdir(store.root) if name.startswith(".tmp-")] == []
+
+
+def test_save_reraises_other_os_errors(store, embedding, monkeypatch):
+    vector_store = FAISS.from_texts(TEXTS, embedding)
+
+    def disk_full(src, dst):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(index_store.os, "replace", disk_full)
+    with pytest.raises(OSError):
+        store.save("doc", vector_store)
+
+    assert os.listdir(store.root) == []
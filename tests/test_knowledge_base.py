@@ -0,0 +1,154 @@
+import json
+import os
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from modules.knowledge_base import (
+    CURRENT_FILE, MANIFEST_FILE, KnowledgeBase, KnowledgeBaseError, KnowledgeBaseStore, document_id,
+)
+
+PHOTOSYNTHESIS = ["Photosynthesis turns light into chemical energy.", "Chlorophyll absorbs red and blue light."]
+TRADE = ["The Silk Road linked China with the Mediterranean.", "Caravans carried silk, spices and ideas."]
+
+
+@pytest.fixture
+def embedding():
+    return DeterministicFakeEmbedding(size=16)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return KnowledgeBaseStore(str(tmp_path))
+
+
+def _add(kb, chunks, filename):
+    doc_id = document_id(" ".join(chunks))
+    return doc_id, kb.add_document(doc_id, filename, chunks)
+
+
+def test_add_indexes_a_document_once(embedding):
+    kb = KnowledgeBase(embedding)
+    doc_id, added = _add(kb, PHOTOSYNTHESIS, "bio.pdf")
+
+    assert added
+    assert _add(kb, PHOTOSYNTHESIS, "bio.pdf") == (doc_id, False)
+    assert [d["filename"] for d in kb.list_documents()] == ["bio.pdf"]
+    assert kb.search("chlorophyll light", k=1, candidates=4)[0].page_content == PHOTOSYNTHESIS[1]
+
+
+def test_search_can_be_restricted_to_some_documents(embedding):
+    kb = KnowledgeBase(embedding)
+    bio, _ = _add(kb, PHOTOSYNTHESIS, "bio.pdf")
+    history, _ = _add(kb, TRADE, "history.pdf")
+
+    results = kb.search("light silk", k=4, candidates=8, doc_ids=[history])
+
+    assert results and {r.metadata["doc_id"] for r in results} == {history}
+
+
+def test_remove_drops_the_document_from_both_rankings(embedding):
+    kb = KnowledgeBase(embedding)
+    bio, _ = _add(kb, PHOTOSYNTHESIS, "bio.pdf")
+    history, _ = _add(kb, TRADE, "history.pdf")
+
+    assert kb.remove_document(bio)
+    assert not kb.remove_document(bio)
+    assert [d["doc_id"] for d in kb.list_documents()] == [history]
+    assert {r.metadata["doc_id"] for r in kb.search("chlorophyll light", k=4, candidates=8)} == {history}
+    assert kb.dense.index.ntotal == len(TRADE)
+
+
+def test_save_and_reload_round_trip(store, embedding):
+    kb = KnowledgeBase(embedding)
+    bio, _ = _add(kb, PHOTOSYNTHESIS, "bio.pdf")
+    store.save("alice", kb)
+
+    loaded = store.load("alice", embedding)
+
+    assert loaded.disk_version == kb.disk_version == store.version("alice")
+    assert [d["doc_id"] for d in loaded.list_documents()] == [bio]
+    assert loaded.search("chlorophyll", k=1, candidates=4)[0].metadata["doc_id"] == bio
+
+
+def test_another_workers_save_changes_the_version(store, embedding):
+    mine = KnowledgeBase(embedding)
+    _add(mine, PHOTOSYNTHESIS, "bio.pdf")
+    store.save("alice", mine)
+
+    theirs = store.load("alice", embedding)
+    _add(theirs, TRADE, "history.pdf")
+    store.save("alice", theirs)
+
+    assert store.version("alice") != mine.disk_version
+    assert len(store.load("alice", embedding).documents) == 2
+
+
+def test_save_keeps_only_the_current_version(store, embedding):
+    kb = KnowledgeBase(embedding)
+    _add(kb, PHOTOSYNTHESIS, "bio.pdf")
+    store.save("alice", kb)
+    _add(kb, TRADE, "history.pdf")
+    store.save("alice", kb)
+
+    assert sorted(os.listdir(store._path("alice"))) == sorted([CURRENT_FILE, kb.disk_version])
+
+
+def test_missing_knowledge_base_loads_empty(store, embedding):
+    kb = store.load("nobody", embedding)
+
+    assert kb.documents == {} and kb.disk_version == ""
+
+
+def test_corrupt_manifest_raises_and_is_not_saved_over(store, embedding):
+    kb = KnowledgeBase(embedding)
+    _add(kb, PHOTOSYNTHESIS, "bio.pdf")
+    store.save("alice", kb)
+    manifest = os.path.join(store._path("alice"), kb.disk_version, MANIFEST_FILE)
+    with open(manifest, "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    with pytest.raises(KnowledgeBaseError):
+        store.load("alice", embedding)
+    with open(manifest, encoding="utf-8") as f:
+        assert f.read() == "{not json"
+
+
+def test_reads_knowledge_bases_saved_in_the_legacy_layout(store, embedding):
+    kb = KnowledgeBase(embedding)
+    bio, _ = _add(kb, PHOTOSYNTHESIS, "bio.pdf")
+    path = store._path("alice")
+    os.makedirs(path)
+    kb.dense.save_local(path)
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(kb.documents, f)
+
+    loaded = store.load("alice", embedding)
+    assert list(loaded.documents) == [bio]
+
+    _add(loaded, TRADE, "history.pdf")
+    store.save("alice", loaded)
+    assert sorted(os.listdir(path)) == sorted([CURRENT_FILE, loaded.disk_version])
+    assert len(store.load("alice", embedding).documents) == 2
+
+
+def test_load_rereads_when_another_worker_replaces_the_copy_mid_read(store, embedding, monkeypatch):
+    old = KnowledgeBase(embedding)
+    _add(old, PHOTOSYNTHESIS, "bio.pdf")
+    store.save("alice", old)
+    new = KnowledgeBase(embedding)
+    _add(new, TRADE, "history.pdf")
+
+    from modules import knowledge_base
+    load_local = knowledge_base.FAISS.load_local
+
+    def save_first(*args, **kwargs):
+        monkeypatch.setattr(knowledge_base.FAISS, "load_local", load_local)
+        store.save("alice", new)  # Deletes the version being read.
+        return load_local(*args, **kwargs)
+
+    monkeypatch.setattr(knowledge_base.FAISS, "load_local", save_first)
+
+    loaded = store.load("alice", embedding)
+    assert loaded.disk_version == new.disk_version
+    assert loaded.list_documents()[0]["filename"] == "history.pdf"
@@ -0,0 +1,180 @@
+import json
+import re
+import time
+
+import pytest
+
+from modules import config, embedding_service, mcq_generator
+from modules.mcq_generator import _QuestionStreamParser, _section_quotas, _validate_mcq
+
+
+def _mcq(question, options=("Paris", "Rome", "Berlin", "Madrid"), answer="Paris"):
+    return {"question": question, "options": list(options), "answer": answer}
+
+
+def _feed_in_chunks(parser, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items += parser.feed(text[i:i + size])
+    return items
+
+
+# ---------------- _QuestionStreamParser ----------------
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_parser_returns_each_question_once_whatever_the_chunking(chunk_size):
+    questions = [_mcq("Capital of France?"), _mcq("Capital of Italy?", answer="Rome")]
+    text = json.dumps({"questions": questions})
+
+    assert _feed_in_chunks(_QuestionStreamParser(), text, chunk_size) == questions
+
+
+def test_parser_ignores_braces_and_escaped_quotes_inside_strings():
+    question = _mcq('What does "{x}" print, \\ or }?')
+    text = json.dumps({"questions": [question]})
+
+    assert _feed_in_chunks(_QuestionStreamParser(), text, 2) == [question]
+
+
+def test_parser_yields_none_for_a_malformed_question_and_keeps_going():
+    text = '{"questions": [{"question": "Broken", "options": [1, 2,]}, ' + json.dumps(_mcq("Fine?")) + "]}"
+
+    assert _QuestionStreamParser().feed(text) == [None, _mcq("Fine?")]
+
+
+def test_parser_keeps_an_unfinished_question_for_the_next_chunk():
+    parser = _QuestionStreamParser()
+    text = json.dumps({"questions": [_mcq("Capital of France?")]})
+
+    assert parser.feed(text[:40]) == []
+    assert parser.feed(text[40:]) == [_mcq("Capital of France?")]
+    assert parser.text == text
+
+
+# ---------------- _validate_mcq ----------------
+def test_validate_accepts_and_strips_a_good_question():
+    item = {"question": "  Capital of France? ", "options": ["Paris", "Rome", "Berlin", "Madrid"], "answer": " Paris "}
+
+    assert _validate_mcq(item) == _mcq("Capital of France?")
+
+
+def test_validate_maps_a_letter_answer_and_strips_option_prefixes():
+    item = {"question": "Capital of Italy?", "options": ["A) Paris", "B) Rome", "C) Berlin", "D) Madrid"], "answer": "b"}
+
+    assert _validate_mcq(item) == _mcq("Capital of Italy?", answer="Rome")
+
+
+def test_validate_matches_the_answer_case_insensitively():
+    assert _validate_mcq(_mcq("Capital of France?", answer="PARIS"))["answer"] == "Paris"
+
+
+@pytest.mark.parametrize("item", [
+    None,
+    "Capital of France?",
+    _mcq(""),
+    _mcq("Three options?", options=("Paris", "Rome", "Berlin")),
+    _mcq("Repeated options?", options=("Paris", "paris", "Berlin", "Madrid")),
+    _mcq("Empty option?", options=("Paris", "", "Berlin", "Madrid")),
+    _mcq("Answer not an option?", answer="Lisbon"),
+    {"question": "No answer?", "options": ["Paris", "Rome", "Berlin", "Madrid"]},
+    {"question": "Options not strings?", "options": [1, 2, 3, 4], "answer": "1"},
+])
+def test_validate_rejects_unusable_questions(item):
+    assert _validate_mcq(item) is None
+
+
+# ---------------- _section_quotas ----------------
+@pytest.mark.parametrize("num_sections,num_questions", [(1, 5), (4, 4), (8, 3), (3, 10), (8, 20)])
+def test_quotas_add_up_to_the_requested_number(num_sections, num_questions):
+    quotas = _section_quotas(num_sections, num_questions)
+
+    assert sum(quotas.values()) == num_questions
+    assert len(quotas) == min(num_sections, num_questions)
+    assert all(0 <= idx < num_sections for idx in quotas)
+    assert max(quotas.values()) - min(quotas.values()) <= 1
+
+
+def test_quotas_spread_few_questions_over_the_whole_document():
+    assert sorted(_section_quotas(8, 3)) == [0, 2, 5]
+
+
+def test_quotas_use_every_section_when_there_are_enough_questions():
+    assert _section_quotas(3, 10) == {0: 4, 1: 3, 2: 3}
+
+
+# ---------------- structured generation ----------------
+class _FakeClient:
+    """Answers structured prompts per section; sections in `broken` only return invalid questions."""
+
+    def __init__(self, broken=(), slow=()):
+        self.broken, self.slow = set(broken), set(slow)
+        self.asked = []
+        self._serial = 0
+
+    def stream(self, prompt, model, options, timeout=120, format=None):
+        section = re.search(r'TEXT TO QUIZ:\s*"(\w+)"', prompt).group(1)
+        count = int(re.search(r"Create exactly (\d+)", prompt).group(1))
+        self.asked.append((section, count))
+        if section in self.slow:
+            time.sleep(0.1)
+        questions = []
+        for _ in range(count):
+            self._serial += 1
+            if section in self.broken:
+                questions.append({"question": "Only three?", "options": ["a", "b", "c"], "answer": "a"})
+            else:
+                questions.append(_mcq(f"{section} question {self._serial}?"))
+        text = json.dumps({"questions": questions})
+        return (text[i:i + 5] for i in range(0, len(text), 5))
+
+
+@pytest.fixture
+def sections(monkeypatch):
+    monkeypatch.setattr(embedding_service, "get_embedding_service", lambda: None)
+    monkeypatch.setattr(config, "MCQ_STRUCTURED_OUTPUT", True)
+
+    def use(names, client):
+        monkeypatch.setattr(mcq_generator, "_partition_sections", lambda text: list(names))
+        monkeypatch.setattr(mcq_generator, "get_client", lambda: client)
+    return use
+
+
+def _section_of(mcq):
+    return mcq["question"].split()[0]
+
+
+def test_batch_quiz_is_in_document_order(sections):
+    sections(["S0", "S1", "S2", "S3"], _FakeClient(slow={"S0"}))
+
+    mcqs = mcq_generator.generate_meaningful_mcqs("text", 8)
+
+    assert [_section_of(m) for m in mcqs] == ["S0", "S0", "S1", "S1", "S2", "S2", "S3", "S3"]
+
+
+def test_short_section_quota_goes_to_an_unused_section(sections):
+    client = _FakeClient(broken={"S2"})
+    sections([f"S{i}" for i in range(8)], client)
+
+    mcqs = mcq_generator.generate_meaningful_mcqs("text", 3)
+
+    assert len(mcqs) == 3
+    # S2's question goes to the nearest section that was not asked (S1 wins the tie with S3).
+    assert [_section_of(m) for m in mcqs] == ["S0", "S1", "S5"]
+
+
+def test_short_section_quota_goes_to_a_finished_section_when_all_are_used(sections):
+    client = _FakeClient(broken={"S1"})
+    sections(["S0", "S1", "S2"], client)
+
+    mcqs = mcq_generator.generate_meaningful_mcqs("text", 6)
+
+    assert len(mcqs) == 6
+    assert "S1" not in {_section_of(m) for m in mcqs}
+    assert [_section_of(m) for m in mcqs] == sorted(_section_of(m) for m in mcqs)
+
+
+def test_quiz_comes_back_short_rather_than_looping_when_every_section_fails(sections):
+    client = _FakeClient(broken={"S0", "S1"})
+    sections(["S0", "S1"], client)
+
+    assert mcq_generator.generate_meaningful_mcqs("text", 4) == [mcq_generator.NO_QUESTIONS_MCQ]
+    assert len(client.asked) == 2 * (config.MCQ_REPAIR_ROUNDS + 1)
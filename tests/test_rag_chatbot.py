@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from modules.index_store import DiskIndexStore
+from modules.rag_chatbot import RAGChatbot
+from modules.vector_store_registry import VectorStoreRegistry
+
+PHOTOSYNTHESIS = "Photosynthesis turns light into chemical energy. " * 5
+TRADE = "The Silk Road linked China with the Mediterranean. " * 5
+
+
+@pytest.fixture
+def bot(tmp_path):
+    # Only the document-session plumbing; no LLM or shared embedding model.
+    bot = object.__new__(RAGChatbot)
+    bot.embedding_model = DeterministicFakeEmbedding(size=16)
+    bot.vector_stores = VectorStoreRegistry(max_bytes=1)
+    bot.index_store = DiskIndexStore(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    bot._session_documents = {}
+    bot._sessions_lock = threading.Lock()
+    return bot
+
+
+def test_evicted_document_is_reloaded_from_disk(bot):
+    bot.setup_document(PHOTOSYNTHESIS, session_key="alice")
+    bot.setup_document(TRADE, session_key="bob")
+    assert bot.vector_stores.stats()["evictions"] == 1
+
+    doc_hash, index = bot._get_document("alice")
+
+    assert doc_hash is not None
+    assert "Photosynthesis" in index.chunks[0]
+    assert bot._session_documents["alice"] == doc_hash
+
+
+def test_evicted_document_missing_from_disk_detaches_the_session(bot, tmp_path):
+    bot.setup_document(PHOTOSYNTHESIS, session_key="alice")
+    for entry in tmp_path.iterdir():
+        for f in entry.iterdir():
+            f.unlink()
+        entry.rmdir()
+    bot.setup_document(TRADE, session_key="bob")
+
+    assert bot._get_document("alice") == (None, None)
+    assert "alice" not in bot._session_documents
+
+
+def test_only_shared_uploads_count_as_registry_hits(bot):
+    bot.vector_stores.max_bytes = 10 * 1024 * 1024
+    bot.setup_document(PHOTOSYNTHESIS, session_key="alice")
+    for _ in range(3):
+        bot._get_document("alice")
+    assert bot.vector_stores.stats()["hits"] == 0
+
+    bot.setup_document(PHOTOSYNTHESIS, session_key="bob")
+    assert bot.vector_stores.stats()["hits"] == 1